@@ -1,12 +1,11 @@
 from flask import Flask, redirect, request, url_for, abort
 from flask_cors import CORS
 import os
-from flask_migrate import Migrate
-from db import db, init_db
+from db import db, init_db, STARTUP_MODE
 from oauthlib.oauth2 import WebApplicationClient
 from flask_login import LoginManager
 from flask_session import Session
-from models import User
+import auth
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY")
@@ -41,14 +40,26 @@ login_manager.init_app(app)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(user_id)
+    return auth.get_user(user_id)
 
 init_db(app)
-migrate = Migrate(app, db)
+
+# Production workers don't need the migration commands, and importing them pulls in Alembic.
+if STARTUP_MODE != "production" or os.environ.get("FLASK_RUN_FROM_CLI"):
+    from flask_migrate import Migrate
+    migrate = Migrate(app, db)
 
 from routes import api
 app.register_blueprint(api, url_prefix="/api")
 
+# Have the Google discovery document ready before the first sign-in.
+import config
+config.refresh_google_provider_cfg_in_background()
+
+if os.environ.get("PREFETCH_IN_PROCESS") == "1":
+    import prefetch
+    prefetch.start(app)
+
 @app.route('/')
 def hello():
     return "Hello, world!"
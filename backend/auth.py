@@ -0,0 +1,90 @@
+import os
+from collections import namedtuple
+from functools import wraps
+import jwt
+from flask import g, jsonify, request
+from flask_login import UserMixin
+from caching import LRUCache
+from models import User
+
+SECRET_KEY = os.environ.get("SECRET_KEY")
+USER_CACHE_SIZE = int(os.environ.get("AUTH_USER_CACHE_SIZE", 1000))
+USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", 60))
+
+
+class UserContext(namedtuple("UserContext", ["id", "google_id", "email", "name", "profile_picture", "created_at"]), UserMixin):
+    """A detached, immutable snapshot of a users row that is safe to share between requests."""
+    __slots__ = ()
+
+    def get_id(self):
+        return str(self.id)
+
+
+_users = LRUCache(threshold=USER_CACHE_SIZE, default_timeout=USER_CACHE_TTL)
+
+
+class AuthError(Exception):
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def get_user(user_id):
+    """Returns the UserContext for user_id, reading the users table at most once per USER_CACHE_TTL."""
+    key = str(user_id)
+    user = _users.get(key)
+    if user is None:
+        row = User.query.get(user_id)
+        if row is None:
+            return None
+        user = UserContext(row.id, row.google_id, row.email, row.name, row.profile_picture, row.created_at)
+        _users.set(key, user)
+    return user
+
+def forget_user(user_id):
+    """Drops a cached user, e.g. after its row changes."""
+    _users.delete(str(user_id))
+
+def decode_token():
+    """Verifies the request's bearer token once per request and returns its claims."""
+    if "auth_claims" in g:
+        return g.auth_claims
+
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise AuthError("Missing or invalid token")
+
+    try:
+        claims = jwt.decode(auth_header.split(" ")[1], SECRET_KEY, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        raise AuthError("Token expired")
+    except jwt.InvalidTokenError:
+        raise AuthError("Invalid token")
+
+    g.auth_claims = claims
+    return claims
+
+def current_user():
+    """The UserContext of the request's bearer token, resolved once per request."""
+    if "auth_user" in g:
+        return g.auth_user
+
+    claims = decode_token()
+    user = get_user(claims.get("user_id")) if claims.get("user_id") is not None else None
+    if user is None or user.google_id != claims.get("google_id"):
+        raise AuthError("User not found", 404)
+
+    g.auth_user = user
+    return user
+
+def auth_required(f):
+    """Passes the authenticated UserContext as the view's first argument, or answers 401/404."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            user = current_user()
+        except AuthError as e:
+            return jsonify({"success": False, "error": e.message}), e.status
+        return f(user, *args, **kwargs)
+    return decorated_function
@@ -0,0 +1,47 @@
+"""Compares payload size and encode time of the stock detail history as rows vs ?format=columnar.
+
+Rows are encoded the way jsonify does it (stdlib json, sorted keys, compact) and with msgspec;
+columnar includes the cost of converting the cached rows. Run from the backend directory:
+python benchmarks/bench_detail_format.py
+"""
+import json
+import os
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import msgspec
+from services import columnar_history
+
+
+def points(count, step, fmt):
+    start = datetime.combine(date.today(), datetime.min.time())
+    return [{"date": (start - step * i).strftime(fmt), "close": round(100 + (i % 37) * 0.731, 2)} for i in range(count)][::-1]
+
+def make_history():
+    return {
+        "1d": {"interval": "5min", "data": points(78, timedelta(minutes=5), "%Y-%m-%d %H:%M:%S")},
+        "1mo": {"interval": "1d", "data": points(30, timedelta(days=1), "%Y-%m-%d")},
+        "1y": {"interval": "1wk", "data": points(52, timedelta(weeks=1), "%Y-%m-%d")},
+        "5y": {"interval": "1mo", "data": points(60, timedelta(days=30), "%Y-%m-%d")}
+    }
+
+def main():
+    history = make_history()
+    encoder = msgspec.json.Encoder(order="sorted")
+    cases = (
+        ("rows, stdlib json", lambda: json.dumps(history, sort_keys=True, separators=(",", ":")).encode()),
+        ("rows, msgspec", lambda: encoder.encode(history)),
+        ("columnar, msgspec", lambda: encoder.encode(columnar_history(history)))
+    )
+
+    runs = 2000
+    print(f"{sum(len(s['data']) for s in history.values())} history points, best of 5 x {runs} runs")
+    for label, encode in cases:
+        per_call = min(timeit.repeat(encode, number=runs, repeat=5)) / runs
+        print(f"{label:20} {len(encode()):6} bytes  {per_call * 1e6:7.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compares the old per-row strptime bucketing with resampling.last_close_by_period on a 5-year daily series.
+
+Run from the backend directory: python benchmarks/bench_resample.py
+"""
+import os
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resampling import last_close_by_period
+
+
+def make_series(years=5):
+    bars = []
+    day = date.today()
+    for i in range(365 * years):
+        if day.weekday() < 5:
+            bars.append({"date": day.isoformat(), "close": 100 + (i % 50) * 0.25})
+        day -= timedelta(days=1)
+    return bars
+
+def legacy_monthly(bars):
+    by_month = {}
+    for item in bars:
+        date_str = item.get("date", "")
+        dt = datetime.strptime(date_str, "%Y-%m-%d")
+        year_month = f"{dt.year}-{dt.month}"
+        if year_month not in by_month or dt > datetime.strptime(by_month[year_month].get("date"), "%Y-%m-%d"):
+            by_month[year_month] = item
+    points = [{"date": item.get("date", ""), "close": float(item.get("close", 0))} for item in by_month.values()]
+    return sorted(points, key=lambda x: x.get("date", ""))
+
+def legacy_weekly(bars):
+    by_week = {}
+    for item in bars:
+        date_str = item.get("date", "")
+        dt = datetime.strptime(date_str, "%Y-%m-%d")
+        year_week = f"{dt.year}-{dt.isocalendar()[1]}"
+        if year_week not in by_week or dt > datetime.strptime(by_week[year_week].get("date"), "%Y-%m-%d"):
+            by_week[year_week] = item
+    points = [{"date": item.get("date", ""), "close": float(item.get("close", 0))} for item in by_week.values()]
+    return sorted(points, key=lambda x: x.get("date", ""))
+
+def main():
+    bars = make_series()
+    runs = 50
+    print(f"{len(bars)} daily bars, best of 5 x {runs} runs")
+
+    for label, legacy, period in (("weekly", legacy_weekly, "week"), ("monthly", legacy_monthly, "month")):
+        old = min(timeit.repeat(lambda: legacy(bars), number=runs, repeat=5)) / runs
+        new = min(timeit.repeat(lambda: last_close_by_period(bars, period), number=runs, repeat=5)) / runs
+        print(f"{label:8} legacy {old * 1000:7.2f} ms   vectorized {new * 1000:7.2f} ms   {old / new:5.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Times a cold start of the app: importing it, and the first request it serves, in fresh interpreters.
+
+Runs each STARTUP_MODE against a throwaway SQLite database with the Google discovery document
+stubbed, so nothing leaves the machine. Run from the backend directory:
+python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+response = app.test_client().get("/api/stats")
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_request": served - start, "modules": len(sys.modules)}))
+"""
+
+
+def start(env):
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def stamp_head(database):
+    """Marks the database as migrated so the production migration check passes."""
+    sys.path.insert(0, BACKEND)
+    from alembic.script import ScriptDirectory
+    from db import MIGRATIONS_DIR
+
+    connection = sqlite3.connect(database)
+    connection.execute("CREATE TABLE IF NOT EXISTS alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)")
+    connection.execute("DELETE FROM alembic_version")
+    connection.executemany("INSERT INTO alembic_version VALUES (?)", [(head,) for head in ScriptDirectory(MIGRATIONS_DIR).get_heads()])
+    connection.commit()
+    connection.close()
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workdir = tempfile.mkdtemp()
+    database = os.path.join(workdir, "startup.db")
+    discovery = os.path.join(workdir, "discovery.json")
+    with open(discovery, "w") as f:
+        json.dump({"authorization_endpoint": "", "token_endpoint": "", "userinfo_endpoint": ""}, f)
+
+    base_env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{database}",
+        ALLOWED_ORIGINS="http://localhost",
+        SKIP_ORIGIN_CHECK_PATHS="/api",
+        SECRET_KEY="benchmark",
+        FMP_API_KEY="benchmark",
+        GOOGLE_DISCOVERY_FILE=discovery,
+        CACHE_DIR=os.path.join(workdir, "cache"),
+        PREFETCH_IN_PROCESS="0",
+    )
+    base_env.pop("FLASK_RUN_FROM_CLI", None)
+
+    # The development run creates the tables; the production run expects them to be migrated.
+    start(dict(base_env, STARTUP_MODE="development"))
+    stamp_head(database)
+
+    for mode in ("development", "production"):
+        env = dict(base_env, STARTUP_MODE=mode)
+        results = [start(env) for _ in range(runs)]
+        imports = statistics.median(result["import"] for result in results) * 1000
+        first = statistics.median(result["first_request"] for result in results) * 1000
+        print(f"{mode:12} import {imports:7.0f} ms   first request {first:7.0f} ms   modules {results[-1]['modules']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Times symbol_index.SymbolIndex build and query latency on a synthetic listing the size of FMP's stock list.
+
+Run from the backend directory: python benchmarks/bench_symbol_search.py
+"""
+import os
+import random
+import string
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from symbol_index import SymbolIndex
+
+WORDS = ["apple", "micro", "systems", "global", "energy", "capital", "holdings", "bank", "pharma",
+         "technologies", "industries", "resources", "trust", "income", "fund", "group", "partners"]
+SUFFIXES = ["Inc.", "Corp", "Ltd", "plc", "ETF", "N.V."]
+EXCHANGES = [("NASDAQ", "NASDAQ Global Select"), ("NYSE", "New York Stock Exchange"), ("LSE", "London"), ("TSX", "Toronto")]
+
+
+def make_listings(count=80000, seed=7):
+    rng = random.Random(seed)
+    listings = []
+    for _ in range(count):
+        symbol = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(1, 5)))
+        name = " ".join(rng.sample(WORDS, rng.randint(1, 3))).title() + " " + rng.choice(SUFFIXES)
+        short, exchange = rng.choice(EXCHANGES)
+        listings.append({"symbol": symbol, "name": name, "exchangeShortName": short, "exchange": exchange})
+    return listings
+
+def main():
+    listings = make_listings()
+    start = time.perf_counter()
+    index = SymbolIndex(listings)
+    print(f"{len(index)} listings indexed in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    runs = 200
+    for query in ("A", "AAPL", "app", "apple", "micro sys", "olding", "zzzz"):
+        per_query = min(timeit.repeat(lambda: index.search(query), number=runs, repeat=5)) / runs
+        print(f"{query!r:12} {per_query * 1e6:9.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Checks that concurrent cache misses on one key cause a single upstream fetch, across threads and worker processes.
+
+Run from the backend directory: python benchmarks/check_single_flight.py
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Process
+
+os.environ["CACHE_BACKEND"] = "filesystem"
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="single_flight_")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import caching
+
+FETCH_LOG = os.path.join(os.environ["CACHE_DIR"], "fetches.log")
+PROCESSES = 4
+THREADS = 20
+
+
+@caching.cached("single_flight_check")
+def slow_fetch(symbol):
+    with open(FETCH_LOG, "a") as log:
+        log.write(f"{os.getpid()} {symbol}\n")
+    time.sleep(0.5)
+    return {"symbol": symbol}
+
+def hammer():
+    with ThreadPoolExecutor(THREADS) as pool:
+        results = list(pool.map(lambda i: slow_fetch("AAPL" if i % 2 else "MSFT"), range(THREADS)))
+    assert all(result["symbol"] in ("AAPL", "MSFT") for result in results)
+
+def main():
+    workers = [Process(target=hammer) for _ in range(PROCESSES)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0, f"worker exited with {worker.exitcode}"
+
+    with open(FETCH_LOG) as log:
+        fetches = Counter(line.split()[1] for line in log)
+    print(f"{PROCESSES} processes x {THREADS} threads, fetches per key: {dict(fetches)}")
+    assert fetches == {"AAPL": 1, "MSFT": 1}, "expected exactly one fetch per key"
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, time as dt_time
+from zoneinfo import ZoneInfo
+from functools import wraps
+from cachelib.base import BaseCache
+from flask import current_app, has_app_context
+from cachelib.file import FileSystemCache
+from singleflight import SingleFlight
+from ratelimit import priority, BACKGROUND
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "filesystem")
+# The filesystem tier stores pickles, so it lives in a directory only this user can write to.
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.environ.get("CACHE_KEY_PREFIX", "stocks:")
+CACHE_THRESHOLD = int(os.environ.get("CACHE_THRESHOLD", 5000))
+LOCAL_CACHE_SIZE = int(os.environ.get("LOCAL_CACHE_SIZE", 500))
+DEFAULT_TIMEOUT = int(os.environ.get("CACHE_DEFAULT_TIMEOUT", 300))
+LOCK_TIMEOUT = float(os.environ.get("CACHE_LOCK_TIMEOUT", 30))
+# Kept beside CACHE_DIR rather than inside it, where FileSystemCache would treat lock files as entries.
+LOCK_DIR = os.environ.get("CACHE_LOCK_DIR", os.path.normpath(CACHE_DIR) + "_locks")
+MAX_STALE = int(os.environ.get("CACHE_MAX_STALE", 600))
+REFRESH_WORKERS = int(os.environ.get("CACHE_REFRESH_WORKERS", 4))
+
+# How long each kind of upstream data stays fresh, in seconds. Override with CACHE_TTL_<CLASS>.
+DATA_CLASS_TTLS = {
+    "quote": 60,
+    "intraday": 300,
+    "movers": 300,
+    "search": 3600,
+    "history": 3600,
+    "rating": 21600,
+    "price_target": 86400,
+    "fundamentals": 86400,
+    "profile": 86400,
+    "symbol_list": 86400,
+}
+DATA_CLASS_TTLS = {name: int(os.environ.get(f"CACHE_TTL_{name.upper()}", ttl)) for name, ttl in DATA_CLASS_TTLS.items()}
+
+# Quotes barely move outside regular trading hours, so they can be kept longer then.
+QUOTE_MARKET_HOURS = os.environ.get("CACHE_QUOTE_MARKET_HOURS", "1") == "1"
+QUOTE_TTL_MARKET_CLOSED = int(os.environ.get("CACHE_TTL_QUOTE_CLOSED", 900))
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = dt_time(9, 30)
+MARKET_CLOSE = dt_time(16, 0)
+
+
+class LRUCache(BaseCache):
+    """In-process cache that keeps at most `threshold` entries, evicting the least recently used.
+
+    Values are stored as-is rather than pickled, so callers must not mutate what they get back.
+    """
+
+    def __init__(self, threshold=500, default_timeout=300):
+        super().__init__(default_timeout)
+        self._threshold = threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None, expires=None):
+        if expires is None:
+            timeout = self.default_timeout if timeout is None else timeout
+            expires = time.time() + timeout if timeout > 0 else 0
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._threshold:
+                self._entries.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        return True
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TieredCache(BaseCache):
+    """A small per-process LRU in front of a cache shared by every worker on the host.
+
+    Shared entries carry their absolute expiry so a value copied into the local tier
+    never outlives the shared one. Errors from the shared tier are logged and treated
+    as misses, so an unavailable Redis degrades to per-process caching.
+    """
+
+    def __init__(self, local, shared, default_timeout=300):
+        super().__init__(default_timeout)
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+
+        try:
+            entry = self.shared.get(key)
+        except Exception as e:
+            print(f"Error reading shared cache for {key}: {str(e)}")
+            return None
+        if entry is None:
+            return None
+
+        expires, value = entry
+        if expires and expires <= time.time():
+            return None
+        self.local.set(key, value, expires=expires)
+        return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        expires = time.time() + timeout if timeout > 0 else 0
+        self.local.set(key, value, expires=expires)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, (expires, value), timeout=timeout)
+            except Exception as e:
+                print(f"Error writing shared cache for {key}: {str(e)}")
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except Exception as e:
+                print(f"Error deleting {key} from shared cache: {str(e)}")
+        return True
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+        return True
+
+
+_redis_client = None
+
+def _private_dir(path):
+    """Creates path accessible to this user only, refusing to use it if another user owns it."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid") and os.stat(path).st_uid != os.getuid():
+        raise RuntimeError(f"{path} is owned by another user; point CACHE_DIR and CACHE_LOCK_DIR at directories this user owns")
+
+def build_shared_cache(backend=CACHE_BACKEND):
+    """Create the cross-worker tier: "filesystem" (default), "redis", or "simple"/"none" for process-local only."""
+    if backend == "filesystem":
+        _private_dir(CACHE_DIR)
+        _private_dir(LOCK_DIR)
+        return FileSystemCache(CACHE_DIR, threshold=CACHE_THRESHOLD, default_timeout=DEFAULT_TIMEOUT)
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        from cachelib.redis import RedisCache
+        global _redis_client
+        _redis_client = redis.from_url(CACHE_REDIS_URL)
+        return RedisCache(host=_redis_client, default_timeout=DEFAULT_TIMEOUT, key_prefix=CACHE_KEY_PREFIX)
+    if backend in ("simple", "none"):
+        return None
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+
+def market_is_open(now=None):
+    """True during regular US trading hours (exchange holidays are not taken into account)."""
+    now = now or datetime.now(MARKET_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+def ttl_for(data_class):
+    """Returns the cache timeout for a data class, or the default timeout for None."""
+    if data_class is None:
+        return DEFAULT_TIMEOUT
+    if data_class == "quote" and QUOTE_MARKET_HOURS and not market_is_open():
+        return QUOTE_TTL_MARKET_CLOSED
+    return DATA_CLASS_TTLS[data_class]
+
+cache = TieredCache(
+    LRUCache(threshold=LOCAL_CACHE_SIZE, default_timeout=DEFAULT_TIMEOUT),
+    build_shared_cache(),
+    default_timeout=DEFAULT_TIMEOUT
+)
+
+single_flight = SingleFlight()
+
+def _wait_for(acquire, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        if acquire():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+
+def _try_flock(lock_file):
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+def _same_file(lock_file, path):
+    try:
+        opened, current = os.fstat(lock_file.fileno()), os.stat(path)
+    except FileNotFoundError:
+        return False
+    return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+def _flock_path(path, timeout):
+    """Opens and locks the file at path, or returns None after timeout seconds.
+
+    Holders delete the file when they release it, so a lock taken on a file that has since been
+    removed or replaced is dropped and taken again on the current one.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        lock_file = open(path, "a")
+        if _wait_for(lambda: _try_flock(lock_file), max(deadline - time.monotonic(), 0)) and _same_file(lock_file, path):
+            return lock_file
+        lock_file.close()
+        if time.monotonic() >= deadline:
+            return None
+
+@contextmanager
+def shared_lock(key, timeout=LOCK_TIMEOUT):
+    """Holds a lock on key across every worker using the shared tier.
+
+    Yields whether the lock was acquired; after `timeout` seconds the caller goes ahead
+    without it rather than waiting on a stuck worker forever.
+    """
+    if isinstance(cache.shared, FileSystemCache) and fcntl is not None:
+        os.makedirs(LOCK_DIR, mode=0o700, exist_ok=True)
+        path = os.path.join(LOCK_DIR, hashlib.sha1(key.encode()).hexdigest() + ".lock")
+        lock_file = _flock_path(path, timeout)
+        try:
+            yield lock_file is not None
+        finally:
+            if lock_file is not None:
+                # Remove the file while still holding the lock, so lock files don't pile up per key.
+                os.unlink(path)
+                lock_file.close()
+    elif _redis_client is not None:
+        lock_key = f"{CACHE_KEY_PREFIX}lock:{key}"
+        token = uuid.uuid4().hex.encode()
+        acquired = _wait_for(lambda: _redis_client.set(lock_key, token, nx=True, px=int(LOCK_TIMEOUT * 1000)), timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired and _redis_client.get(lock_key) == token:
+                _redis_client.delete(lock_key)
+    else:
+        yield True
+
+# Values cached with a staleness allowance are wrapped so readers can tell when they stop being fresh.
+Entry = namedtuple("Entry", ["value", "fresh_until"])
+
+_refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS)
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def _store(cache_key, rv, data_class, max_stale):
+    ttl = ttl_for(data_class)
+    if max_stale:
+        cache.set(cache_key, Entry(rv, time.time() + ttl), timeout=ttl + max_stale)
+    else:
+        cache.set(cache_key, rv, timeout=ttl)
+
+def _refresh_in_background(cache_key, compute, data_class, should_cache, max_stale):
+    """Recomputes a stale entry off the request path, once per key across threads and workers."""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def refresh():
+        try:
+            with app.app_context() if app else nullcontext(), priority(BACKGROUND):
+                with shared_lock(cache_key, timeout=0) as acquired:
+                    if not acquired:
+                        return
+                    # Skip the local copy: another worker may already have refreshed the shared one.
+                    cache.local.delete(cache_key)
+                    entry = cache.get(cache_key)
+                    if isinstance(entry, Entry) and entry.fresh_until > time.time():
+                        return
+                    rv = compute()
+                    if should_cache(rv):
+                        _store(cache_key, rv, data_class, max_stale)
+        except Exception as e:
+            print(f"Error refreshing {cache_key}: {str(e)}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(cache_key)
+
+    _refresh_executor.submit(refresh)
+
+def get_or_compute(cache_key, compute, data_class=None, should_cache=lambda rv: rv is not None, max_stale=0):
+    """Returns the cached value for cache_key, computing it at most once across threads and workers on a miss.
+
+    With max_stale, an expired value is still returned for up to max_stale seconds while it is
+    recomputed in the background; past that the caller waits for a fresh value.
+    """
+    rv = cache.get(cache_key)
+    if max_stale and rv is not None and not isinstance(rv, Entry):
+        rv = None
+    if rv is not None:
+        if not max_stale:
+            return rv
+        if rv.fresh_until <= time.time():
+            _refresh_in_background(cache_key, compute, data_class, should_cache, max_stale)
+        return rv.value
+
+    def compute_once():
+        with shared_lock(cache_key):
+            # Another worker may have filled the key while we waited for the lock.
+            rv = cache.get(cache_key)
+            if rv is not None:
+                return rv.value if isinstance(rv, Entry) else rv
+            rv = compute()
+            if should_cache(rv):
+                _store(cache_key, rv, data_class, max_stale)
+            return rv
+
+    return single_flight.do(cache_key, compute_once)
+
+def stats():
+    return {
+        "local_entries": len(cache.local),
+        "computations_in_flight": single_flight.in_flight(),
+        "refreshes_in_flight": len(_refreshing)
+    }
+
+def cached(key_prefix, data_class=None, max_stale=0, should_cache=lambda rv: rv is not None):
+    """Caches f's return value per argument list for the TTL of data_class, serving it stale for up to max_stale seconds.
+
+    Return values for which should_cache is false are passed through without being stored.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cache_key = key_prefix
+            if args:
+                cache_key += "_" + "_".join(str(arg) for arg in args)
+            if kwargs:
+                cache_key += "_" + "_".join(f"{k}_{v}" for k, v in sorted(kwargs.items()))
+
+            return get_or_compute(cache_key, lambda: f(*args, **kwargs), data_class, should_cache, max_stale)
+        return decorated_function
+    return decorator
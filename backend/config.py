@@ -1,5 +1,9 @@
 import os
-import requests
+import json
+import threading
+import time
+import upstream
+from werkzeug.http import parse_cache_control_header
 from oauthlib.oauth2 import WebApplicationClient
 
 
@@ -12,8 +16,63 @@ SQLALCHEMY_TRACK_MODIFICATIONS = False
 GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
 GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+# Used when Google's response carries no Cache-Control max-age.
+GOOGLE_DISCOVERY_TTL = int(os.environ.get("GOOGLE_DISCOVERY_TTL", 3600))
+GOOGLE_DISCOVERY_RETRY = int(os.environ.get("GOOGLE_DISCOVERY_RETRY", 60))
+# Path to a local discovery document, used instead of fetching Google's (tests, offline development).
+GOOGLE_DISCOVERY_FILE = os.environ.get("GOOGLE_DISCOVERY_FILE")
 
 client = WebApplicationClient(GOOGLE_CLIENT_ID)
 
+_provider_cfg = None
+_provider_cfg_expires = 0
+_provider_cfg_lock = threading.Lock()
+_refreshing = threading.Lock()
+
+def set_google_provider_cfg(cfg, ttl=None):
+    """Installs a discovery document, e.g. a stub in tests; without a ttl it never expires."""
+    global _provider_cfg, _provider_cfg_expires
+    with _provider_cfg_lock:
+        _provider_cfg = cfg
+        _provider_cfg_expires = time.time() + ttl if ttl is not None else float("inf")
+
+def load_google_provider_cfg():
+    """Fetches the discovery document and caches it for as long as Google's Cache-Control allows."""
+    if GOOGLE_DISCOVERY_FILE:
+        with open(GOOGLE_DISCOVERY_FILE) as f:
+            set_google_provider_cfg(json.load(f))
+        return _provider_cfg
+
+    response = upstream.get(GOOGLE_DISCOVERY_URL)
+    response.raise_for_status()
+    max_age = parse_cache_control_header(response.headers.get("Cache-Control")).max_age
+    set_google_provider_cfg(response.json(), max_age if max_age is not None else GOOGLE_DISCOVERY_TTL)
+    return _provider_cfg
+
+def _refresh_google_provider_cfg():
+    global _provider_cfg_expires
+    try:
+        load_google_provider_cfg()
+    except Exception as e:
+        print(f"Error refreshing Google discovery document: {str(e)}")
+        with _provider_cfg_lock:
+            _provider_cfg_expires = time.time() + GOOGLE_DISCOVERY_RETRY
+    finally:
+        _refreshing.release()
+
+def refresh_google_provider_cfg_in_background():
+    """Starts a refresh unless one is already running."""
+    if _refreshing.acquire(blocking=False):
+        threading.Thread(target=_refresh_google_provider_cfg, name="google-discovery", daemon=True).start()
+
 def get_google_provider_cfg():
-    return requests.get(GOOGLE_DISCOVERY_URL).json()
+    """The cached discovery document. Only the very first call waits on Google; once it expires
+    the old copy keeps being served while a background refresh fetches the new one."""
+    if _provider_cfg is None:
+        # Wait for the startup load if it is still running rather than fetching a second copy.
+        with _refreshing:
+            if _provider_cfg is None:
+                load_google_provider_cfg()
+    elif time.time() >= _provider_cfg_expires:
+        refresh_google_provider_cfg_in_background()
+    return _provider_cfg
@@ -1,11 +1,124 @@
+import os
+import threading
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import make_url
+import querystats
+
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+# Seconds; connections are replaced before idle timeouts on the server or a proxy can close them.
+POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+# Checks each connection on checkout, so connections left dead by a failover are replaced
+# instead of failing (or hanging) the request that draws them.
+POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+# Milliseconds, PostgreSQL only; 0 keeps the server's setting.
+STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 0))
+CONNECT_TIMEOUT = int(os.environ.get("DB_CONNECT_TIMEOUT", 10))
+# "production" leaves the schema to the Alembic migrations: workers skip create_all at boot and only
+# check, off the startup path, that the database is at the newest migration.
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "development")
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
 
 db = SQLAlchemy()
 
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for uri from the DB_* settings above."""
+    options = {"pool_pre_ping": POOL_PRE_PING, "pool_recycle": POOL_RECYCLE}
+    backend = make_url(uri).get_backend_name() if uri else "sqlite"
+    if backend == "sqlite":
+        # SQLite connections are local files; Flask-SQLAlchemy picks a suitable pool for them.
+        return options
+
+    options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+    if backend in ("postgresql", "postgres"):
+        connect_args = {"connect_timeout": CONNECT_TIMEOUT}
+        if STATEMENT_TIMEOUT:
+            connect_args["options"] = f"-c statement_timeout={STATEMENT_TIMEOUT}"
+        options["connect_args"] = connect_args
+    return options
+
 def init_db(app):
     """Initialize the database with the Flask app."""
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config.get("SQLALCHEMY_DATABASE_URI")))
     db.init_app(app)
+    querystats.init_app(app)
 
     with app.app_context():
         from models import User
-        db.create_all()
+        querystats.instrument(db.engine)
+        if STARTUP_MODE == "production":
+            threading.Thread(target=check_migrations, args=(app,), name="migration-check", daemon=True).start()
+        else:
+            db.create_all()
+
+def check_migrations(app):
+    """Returns whether the database is at the newest migration, printing what to do if it is not."""
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    try:
+        heads = set(ScriptDirectory(MIGRATIONS_DIR).get_heads())
+        with app.app_context(), db.engine.connect() as connection:
+            current = set(MigrationContext.configure(connection).get_current_heads())
+    except Exception as e:
+        print(f"Error checking database migrations: {str(e)}")
+        return False
+
+    if current != heads:
+        print(f"Database is at revision {', '.join(sorted(current)) or 'none'}, "
+              f"migrations are at {', '.join(sorted(heads))}: run flask db upgrade")
+        return False
+    return True
+
+def _conflict_insert():
+    """The dialect's INSERT construct supporting ON CONFLICT, or None if it has none."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+def upsert(model, rows, index_elements, chunk_size=500):
+    """Insert rows, overwriting the non-key columns of rows that already exist."""
+    if not rows:
+        return
+
+    insert = _conflict_insert()
+    if insert is None:
+        for row in rows:
+            db.session.merge(model(**row))
+        return
+
+    for i in range(0, len(rows), chunk_size):
+        stmt = insert(model).values(rows[i:i + chunk_size])
+        update_columns = {
+            column.name: stmt.excluded[column.name]
+            for column in model.__table__.columns
+            if column.name not in index_elements
+        }
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=update_columns)
+        db.session.execute(stmt)
+
+def insert_ignore(model, rows, index_elements, chunk_size=500):
+    """Insert rows, silently skipping those that collide with an existing row on index_elements."""
+    if not rows:
+        return
+
+    insert = _conflict_insert()
+    if insert is None:
+        from sqlalchemy.exc import IntegrityError
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(model(**row))
+            except IntegrityError:
+                pass
+        return
+
+    for i in range(0, len(rows), chunk_size):
+        stmt = insert(model).values(rows[i:i + chunk_size]).on_conflict_do_nothing(index_elements=index_elements)
+        db.session.execute(stmt)
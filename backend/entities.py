@@ -0,0 +1,178 @@
+import os
+import time
+import fmp
+import upstream
+import price_store
+import sparkline
+from caching import cache, ttl_for
+
+QUOTE_BATCH_SIZE = int(os.environ.get("FMP_QUOTE_BATCH_SIZE", 100))
+PROFILE_BATCH_SIZE = int(os.environ.get("FMP_PROFILE_BATCH_SIZE", 50))
+# Calendar days that always cover the latest 30 trading days.
+RECENT_HISTORY_DAYS = 50
+# How long a symbol's quote version outlives its quote; readers treat a missing version as changed.
+QUOTE_VERSION_TTL = int(os.environ.get("QUOTE_VERSION_TTL", 86400))
+
+
+def normalize_symbols(symbols):
+    """Upper-cases and de-duplicates symbols, keeping their order."""
+    seen = []
+    for symbol in symbols:
+        symbol = (symbol or "").strip().upper()
+        if symbol and symbol not in seen:
+            seen.append(symbol)
+    return seen
+
+def _cached_entities(kind, symbols, refresh=False):
+    if refresh:
+        return {}, list(symbols)
+
+    found = {}
+    missing = []
+    for symbol in symbols:
+        rv = cache.get(f"entity:{kind}:{symbol}")
+        if rv is not None:
+            found[symbol] = rv
+        else:
+            missing.append(symbol)
+    return found, missing
+
+def _fetch_batched(kind, data_class, path, symbols, batch_size):
+    """Fetches a comma-separated multi-symbol endpoint in parallel batches and caches one entity per symbol.
+
+    Symbols absent from a successful response are cached as {} so unknown tickers are not re-requested.
+    """
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+    futures = upstream.submit_all(fmp.fetch_json, [(f"{path}/{','.join(batch)}",) for batch in batches])
+
+    fetched = {}
+    for batch, future in zip(batches, futures):
+        data = future.result()
+        if not isinstance(data, list):
+            continue
+        by_symbol = {(item.get("symbol") or "").upper(): item for item in data}
+        for symbol in batch:
+            entity = by_symbol.get(symbol, {})
+            cache.set(f"entity:{kind}:{symbol}", entity, timeout=ttl_for(data_class))
+            fetched[symbol] = entity
+    return fetched
+
+def get_quotes(symbols, refresh=False):
+    """Returns {symbol: FMP quote} for the symbols FMP knows, in one request per QUOTE_BATCH_SIZE uncached symbols.
+
+    refresh re-fetches every symbol and overwrites its cached entry.
+    """
+    quotes, missing = _cached_entities("quote", normalize_symbols(symbols), refresh)
+    if missing:
+        fetched = _fetch_batched("quote", "quote", "v3/quote", missing, QUOTE_BATCH_SIZE)
+        _bump_quote_versions(fetched)
+        quotes.update(fetched)
+    return {symbol: quote for symbol, quote in quotes.items() if quote}
+
+def _bump_quote_versions(quotes):
+    """Stamps each symbol whose price or change moved with the current time in milliseconds."""
+    now = int(time.time() * 1000)
+    for symbol, quote in quotes.items():
+        fingerprint = (quote.get("price"), quote.get("changesPercentage")) if quote else None
+        previous = cache.get(f"entity:quote_version:{symbol}")
+        if previous is None or previous[0] != fingerprint:
+            cache.set(f"entity:quote_version:{symbol}", (fingerprint, now), timeout=QUOTE_VERSION_TTL)
+
+def get_quote_versions(symbols):
+    """Returns {symbol: millisecond timestamp of its last quote change, or None if unknown}."""
+    versions = {}
+    for symbol in normalize_symbols(symbols):
+        entry = cache.get(f"entity:quote_version:{symbol}")
+        versions[symbol] = entry[1] if entry is not None else None
+    return versions
+
+def get_profiles(symbols):
+    """Returns {symbol: FMP company profile} for the symbols FMP knows."""
+    profiles, missing = _cached_entities("profile", normalize_symbols(symbols))
+    if missing:
+        profiles.update(_fetch_batched("profile", "profile", "v3/profile", missing, PROFILE_BATCH_SIZE))
+    return {symbol: profile for symbol, profile in profiles.items() if profile}
+
+def get_histories(symbols, refresh=False):
+    """Returns the last 30 daily closes per symbol, reading uncached symbols from the price store."""
+    histories, missing = _cached_entities("history", normalize_symbols(symbols), refresh)
+
+    if missing:
+        daily_history = price_store.get_daily_history(missing, RECENT_HISTORY_DAYS)
+        for symbol, bars in daily_history.items():
+            history_list = [
+                {"date": item.get("date", ""), "price": item.get("close", 0)}
+                for item in bars[:30]
+            ]
+            histories[symbol] = history_list
+            # Empty means the sync failed or FMP has no bars: read the store again next time rather
+            # than hiding the history for a full TTL once FMP recovers.
+            if history_list:
+                cache.set(f"entity:history:{symbol}", history_list, timeout=ttl_for("history"))
+
+    return histories
+
+def fetch_rating(symbol):
+    """The rating recommendation for symbol, "NONE" if FMP has none, or None if the lookup failed."""
+    try:
+        rating_data = fmp.fetch_json(f"v3/rating/{symbol}")
+    except Exception as e:
+        print(f"Error fetching rating for {symbol}: {str(e)}")
+        return None
+    # Quota and bad-key errors come back as a 200 with an error body; those must not be cached.
+    if fmp.is_error(rating_data) or not isinstance(rating_data, list):
+        print(f"Error fetching rating for {symbol}: {str(rating_data)[:200]}")
+        return None
+    if rating_data:
+        return rating_data[0].get('ratingRecommendation', 'NONE')
+    return "NONE"
+
+def get_ratings(symbols, refresh=False):
+    """Returns the rating recommendation per symbol, fetching uncached symbols in parallel.
+
+    Failed lookups read as "NONE" without being cached; with refresh they raise once every
+    symbol has been tried, so the prefetcher retries them instead of counting the pass as done.
+    """
+    ratings, missing = _cached_entities("rating", normalize_symbols(symbols), refresh)
+    futures = upstream.submit_all(fetch_rating, [(symbol,) for symbol in missing])
+
+    failed = []
+    for symbol, future in zip(missing, futures):
+        recommendation = future.result()
+        if recommendation is None:
+            failed.append(symbol)
+            recommendation = "NONE"
+        else:
+            cache.set(f"entity:rating:{symbol}", recommendation, timeout=ttl_for("rating"))
+        ratings[symbol] = recommendation
+
+    if refresh and failed:
+        raise RuntimeError(f"Could not refresh ratings for {', '.join(failed)}")
+    return ratings
+
+def fetch_sparkline(symbol):
+    """Hourly closes for symbol downsampled for a sparkline, [] if FMP has none, or None if the lookup failed."""
+    try:
+        chart_results = fmp.fetch_json(f"v3/historical-chart/1hour/{symbol}")
+    except Exception as e:
+        print(f"Error fetching chart data for {symbol}: {str(e)}")
+        return None
+    if fmp.is_error(chart_results) or not isinstance(chart_results, list):
+        print(f"Error fetching chart data for {symbol}: {str(chart_results)[:200]}")
+        return None
+    return sparkline.downsample([item.get('close', 0) for item in chart_results][::-1])
+
+def get_sparklines(symbols):
+    """Returns hourly closes per symbol, oldest first, downsampled to sparkline.POINTS before caching."""
+    sparklines, missing = _cached_entities("sparkline", normalize_symbols(symbols))
+    futures = upstream.submit_all(fetch_sparkline, [(symbol,) for symbol in missing])
+
+    for symbol, future in zip(missing, futures):
+        chart_data = future.result()
+        if chart_data is None:
+            chart_data = []
+        else:
+            cache.set(f"entity:sparkline:{symbol}", chart_data, timeout=ttl_for("intraday"))
+        sparklines[symbol] = chart_data
+
+    return sparklines
@@ -0,0 +1,38 @@
+import os
+from urllib.parse import urlencode
+import upstream
+from caching import get_or_compute
+from ratelimit import TokenBucket
+
+FMP_BASE_URL = "https://financialmodelingprep.com/api"
+# Calls per minute allowed by the FMP plan; 0 turns the limiter off.
+RATE_LIMIT = float(os.environ.get("FMP_RATE_LIMIT", 300))
+RATE_BURST = int(os.environ.get("FMP_RATE_BURST", 20))
+QUEUE_TIMEOUT = float(os.environ.get("FMP_QUEUE_TIMEOUT", 15))
+
+# One bucket per worker process, so set FMP_RATE_LIMIT to the plan limit divided by the worker count.
+limiter = TokenBucket(RATE_LIMIT / 60, RATE_BURST, max_wait=QUEUE_TIMEOUT)
+
+
+def is_error(data):
+    """FMP reports bad keys and plan limits as a 200 response carrying an "Error Message"."""
+    return isinstance(data, dict) and "Error Message" in data
+
+def fetch_json(path, **params):
+    """GETs an FMP endpoint without caching the response, for callers that cache what they extract from it."""
+    params["apikey"] = os.environ.get("FMP_API_KEY")
+    return upstream.get_json(f"{FMP_BASE_URL}/{path}", params=params, limiter=limiter)
+
+def get_json(path, data_class, **params):
+    """GETs an FMP endpoint such as "v3/quote/AAPL", caching the decoded JSON for the TTL of data_class."""
+    cache_key = f"fmp_{path}"
+    if params:
+        cache_key += "?" + urlencode(sorted(params.items()))
+
+    params["apikey"] = os.environ.get("FMP_API_KEY")
+    return get_or_compute(
+        cache_key,
+        lambda: upstream.get_json(f"{FMP_BASE_URL}/{path}", params=params, limiter=limiter),
+        data_class,
+        should_cache=lambda rv: rv and not is_error(rv)
+    )
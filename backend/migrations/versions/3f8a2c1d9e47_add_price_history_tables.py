@@ -0,0 +1,41 @@
+"""Add price_history and price_history_sync tables
+
+Revision ID: 3f8a2c1d9e47
+Revises: becaf979596e
+Create Date: 2026-10-18 10:12:41.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a2c1d9e47'
+down_revision = 'becaf979596e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('price_history',
+    sa.Column('symbol', sa.String(length=10), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('open', sa.Float(), nullable=True),
+    sa.Column('high', sa.Float(), nullable=True),
+    sa.Column('low', sa.Float(), nullable=True),
+    sa.Column('close', sa.Float(), nullable=True),
+    sa.Column('volume', sa.BigInteger(), nullable=True),
+    sa.PrimaryKeyConstraint('symbol', 'date')
+    )
+    op.create_table('price_history_sync',
+    sa.Column('symbol', sa.String(length=10), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('last_date', sa.Date(), nullable=True),
+    sa.Column('synced_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+
+
+def downgrade():
+    op.drop_table('price_history_sync')
+    op.drop_table('price_history')
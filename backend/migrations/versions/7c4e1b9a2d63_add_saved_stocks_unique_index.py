@@ -0,0 +1,32 @@
+"""Add unique (google_id, symbol) index to saved_stocks
+
+Revision ID: 7c4e1b9a2d63
+Revises: 3f8a2c1d9e47
+Create Date: 2026-10-18 15:20:07.114905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e1b9a2d63'
+down_revision = '3f8a2c1d9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Concurrent saves could insert the same symbol twice before this constraint existed; keep the oldest.
+    op.execute(
+        "DELETE FROM saved_stocks WHERE id NOT IN "
+        "(SELECT MIN(id) FROM saved_stocks GROUP BY google_id, symbol)"
+    )
+    # Also serves lookups by google_id alone, as its leading column.
+    with op.batch_alter_table('saved_stocks', schema=None) as batch_op:
+        batch_op.create_index('ix_saved_stocks_google_id_symbol', ['google_id', 'symbol'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('saved_stocks', schema=None) as batch_op:
+        batch_op.drop_index('ix_saved_stocks_google_id_symbol')
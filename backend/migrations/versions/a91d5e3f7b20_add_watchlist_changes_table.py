@@ -0,0 +1,37 @@
+"""Add watchlist_changes table
+
+Revision ID: a91d5e3f7b20
+Revises: 7c4e1b9a2d63
+Create Date: 2026-10-18 15:48:33.602117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91d5e3f7b20'
+down_revision = '7c4e1b9a2d63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('watchlist_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('google_id', sa.String(length=255), nullable=False),
+    sa.Column('symbol', sa.String(length=10), nullable=False),
+    sa.Column('action', sa.String(length=6), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['google_id'], ['users.google_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('watchlist_changes', schema=None) as batch_op:
+        batch_op.create_index('ix_watchlist_changes_google_id_id', ['google_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('watchlist_changes', schema=None) as batch_op:
+        batch_op.drop_index('ix_watchlist_changes_google_id_id')
+
+    op.drop_table('watchlist_changes')
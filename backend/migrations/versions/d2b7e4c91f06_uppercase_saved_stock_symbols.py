@@ -0,0 +1,31 @@
+"""Upper-case saved stock symbols
+
+Revision ID: d2b7e4c91f06
+Revises: a91d5e3f7b20
+Create Date: 2026-10-18 17:05:41.208733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7e4c91f06'
+down_revision = 'a91d5e3f7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /save_stock used to store symbols as sent, so "aapl" and "AAPL" could both be saved; keep the oldest.
+    op.execute(
+        "DELETE FROM saved_stocks WHERE id NOT IN "
+        "(SELECT MIN(id) FROM saved_stocks GROUP BY google_id, UPPER(symbol))"
+    )
+    op.execute("UPDATE saved_stocks SET symbol = UPPER(symbol) WHERE symbol <> UPPER(symbol)")
+    op.execute("UPDATE watchlist_changes SET symbol = UPPER(symbol) WHERE symbol <> UPPER(symbol)")
+
+
+def downgrade():
+    # The original spelling is not kept, and upper-case symbols are valid under the old schema too.
+    pass
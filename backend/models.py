@@ -23,4 +23,35 @@ class SavedStocks(db.Model):
     company_name = db.Column(db.String(255))
     price_at_save = db.Column(db.Float)
     date_save = db.Column(db.DateTime, default=datetime.utcnow)
-    user = db.relationship('User', backref=db.backref('saved_stocks', lazy=True))
\ No newline at end of file
+    user = db.relationship('User', backref=db.backref('saved_stocks', lazy=True))
+    __table_args__ = (
+        db.Index('ix_saved_stocks_google_id_symbol', 'google_id', 'symbol', unique=True),
+    )
+
+class PriceHistory(db.Model):
+    __tablename__='price_history'
+    symbol = db.Column(db.String(10), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    open = db.Column(db.Float)
+    high = db.Column(db.Float)
+    low = db.Column(db.Float)
+    close = db.Column(db.Float)
+    volume = db.Column(db.BigInteger)
+
+class PriceHistorySync(db.Model):
+    __tablename__='price_history_sync'
+    symbol = db.Column(db.String(10), primary_key=True)
+    start_date = db.Column(db.Date, nullable=False)
+    last_date = db.Column(db.Date, nullable=True)
+    synced_at = db.Column(db.DateTime, nullable=False)
+
+class WatchlistChange(db.Model):
+    __tablename__='watchlist_changes'
+    id = db.Column(db.Integer, primary_key=True)
+    google_id = db.Column(db.String(255), db.ForeignKey('users.google_id', ondelete="CASCADE"), nullable=False)
+    symbol = db.Column(db.String(10), nullable=False)
+    action = db.Column(db.String(6), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_watchlist_changes_google_id_id', 'google_id', 'id'),
+    )
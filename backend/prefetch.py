@@ -0,0 +1,104 @@
+"""Keeps quotes, ratings and recent history for every watchlisted symbol warm in the service cache.
+
+Run it next to the web workers with `python prefetch.py` (add `--once` for a single pass from cron),
+or set PREFETCH_IN_PROCESS=1 to have each web worker start it in a daemon thread. Runs in several
+processes coordinate through the shared cache, so each refresh still happens once per cycle.
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import entities
+import upstream
+from caching import cache, shared_lock, ttl_for
+from models import SavedStocks
+from ratelimit import priority, BACKGROUND
+
+INTERVAL = float(os.environ.get("PREFETCH_INTERVAL", 15))
+BATCH_SIZE = int(os.environ.get("PREFETCH_BATCH_SIZE", 100))
+CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", 2))
+# Upstream calls the batches fan out to run here, so a pass never occupies the pools requests use.
+WORKERS = int(os.environ.get("PREFETCH_WORKERS", 4))
+
+executor = upstream.create_executor(WORKERS, "prefetch")
+
+# Each kind is refreshed once half of its TTL has passed, so entries are replaced before they expire.
+REFRESHERS = {
+    "quote": entities.get_quotes,
+    "rating": entities.get_ratings,
+    "history": entities.get_histories
+}
+
+
+def watched_symbols():
+    """The distinct symbols saved on any watchlist."""
+    rows = SavedStocks.query.with_entities(SavedStocks.symbol).distinct().all()
+    return entities.normalize_symbols(row.symbol for row in rows)
+
+def _due_kinds(now):
+    due = []
+    for kind in REFRESHERS:
+        # Read the shared copy: another process may have run the refresh since we last looked.
+        marker = f"prefetch:last_run:{kind}"
+        cache.local.delete(marker)
+        last_run = cache.get(marker) or 0
+        if now - last_run >= ttl_for(kind) / 2:
+            due.append(kind)
+    return due
+
+def _refresh(app, kind, batch):
+    with app.app_context(), priority(BACKGROUND), upstream.using_executor(executor):
+        REFRESHERS[kind](batch, refresh=True)
+
+def run_once(app):
+    """Refreshes whichever kinds are due for all watched symbols; returns the kinds it refreshed."""
+    with app.app_context(), shared_lock("prefetch", timeout=0) as acquired:
+        if not acquired:
+            return []
+
+        now = time.time()
+        kinds = _due_kinds(now)
+        if not kinds:
+            return []
+
+        symbols = watched_symbols()
+        batches = [symbols[i:i + BATCH_SIZE] for i in range(0, len(symbols), BATCH_SIZE)]
+
+        refreshed = []
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            for kind in kinds:
+                futures = [pool.submit(_refresh, app, kind, batch) for batch in batches]
+                errors = 0
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors += 1
+                        print(f"Error prefetching {kind}: {str(e)}")
+                if not errors:
+                    cache.set(f"prefetch:last_run:{kind}", now, timeout=int(ttl_for(kind)))
+                    refreshed.append(kind)
+        return refreshed
+
+def run_forever(app):
+    while True:
+        try:
+            run_once(app)
+        except Exception as e:
+            print(f"Error in prefetch cycle: {str(e)}")
+        time.sleep(INTERVAL)
+
+def start(app):
+    """Starts the prefetch loop in a daemon thread of this process."""
+    thread = threading.Thread(target=run_forever, args=(app,), name="prefetch", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    from app import app
+
+    if "--once" in sys.argv[1:]:
+        print(f"Refreshed: {', '.join(run_once(app)) or 'nothing due'}")
+    else:
+        run_forever(app)
@@ -0,0 +1,137 @@
+import os
+from datetime import datetime, date, timedelta
+import upstream
+import fmp
+from db import db, upsert
+from models import PriceHistory, PriceHistorySync
+
+SYNC_INTERVAL = int(os.environ.get("PRICE_STORE_SYNC_INTERVAL", 86400))
+HISTORY_BATCH_SIZE = int(os.environ.get("FMP_HISTORY_BATCH_SIZE", 5))
+
+
+def _fetch_bars(symbols, start, end):
+    """Download daily bars for up to HISTORY_BATCH_SIZE symbols sharing the same start date."""
+    history_data = fmp.fetch_json(f"v3/historical-price-full/{','.join(symbols)}", **{"from": start.isoformat(), "to": end.isoformat()})
+
+    # Quota and bad-key errors come back as a 200 with an error body; raise so the batch is retried later.
+    if fmp.is_error(history_data) or not isinstance(history_data, dict):
+        raise RuntimeError(str(history_data)[:200])
+
+    # A single symbol comes back as one object, several as a "historicalStockList".
+    entries = history_data.get("historicalStockList", [history_data])
+    return {entry["symbol"]: entry.get("historical", []) for entry in entries if entry.get("symbol")}
+
+def _plan_fetches(symbols, start, now):
+    """Works out, per symbol, the first date that has to be downloaded (or None if the store is current)."""
+    sync_rows = {row.symbol: row for row in PriceHistorySync.query.filter(PriceHistorySync.symbol.in_(symbols)).all()}
+
+    plan = {}
+    for symbol in symbols:
+        row = sync_rows.get(symbol)
+        due = row is not None and (now - row.synced_at).total_seconds() >= SYNC_INTERVAL
+        if row is None or row.start_date > start:
+            plan[symbol] = start
+        elif row.last_date is None:
+            # FMP had no bars for it when it was last checked; look again once the interval has passed.
+            if due:
+                plan[symbol] = start
+        elif due:
+            # Re-read the last stored bar too, it may have been a partial day.
+            plan[symbol] = row.last_date
+    return plan, sync_rows
+
+def sync(symbols, start):
+    """Bring the stored history for symbols up to date from start onwards, downloading only missing bars."""
+    now = datetime.utcnow()
+    today = date.today()
+    plan, sync_rows = _plan_fetches(symbols, start, now)
+    if not plan:
+        return
+
+    by_start = {}
+    for symbol, fetch_from in plan.items():
+        by_start.setdefault(fetch_from, []).append(symbol)
+
+    batches = []
+    for fetch_from, group in by_start.items():
+        for i in range(0, len(group), HISTORY_BATCH_SIZE):
+            batches.append((fetch_from, group[i:i + HISTORY_BATCH_SIZE]))
+
+    futures = upstream.submit_all(_fetch_bars, [(batch, fetch_from, today) for fetch_from, batch in batches])
+
+    rows = []
+    synced = []
+    for (fetch_from, batch), future in zip(batches, futures):
+        try:
+            bars_by_symbol = future.result()
+        except Exception as e:
+            print(f"Error fetching price history for {','.join(batch)}: {str(e)}")
+            continue
+
+        for symbol in batch:
+            row = sync_rows.get(symbol)
+            if symbol not in bars_by_symbol:
+                # Left out of a valid response: FMP has no bars for it. Record the check so it is not
+                # re-downloaded on every call, but leave symbols that already have bars as they are.
+                if row is None or row.last_date is None:
+                    synced.append({"symbol": symbol, "start_date": fetch_from, "last_date": None, "synced_at": now})
+                continue
+
+            bars = bars_by_symbol[symbol]
+            last_date = None
+            for bar in bars:
+                try:
+                    bar_date = datetime.strptime(bar.get("date", ""), "%Y-%m-%d").date()
+                except ValueError:
+                    continue
+                rows.append({
+                    "symbol": symbol,
+                    "date": bar_date,
+                    "open": bar.get("open"),
+                    "high": bar.get("high"),
+                    "low": bar.get("low"),
+                    "close": bar.get("close"),
+                    "volume": bar.get("volume")
+                })
+                if last_date is None or bar_date > last_date:
+                    last_date = bar_date
+
+            known_dates = [d for d in (row.last_date if row else None, last_date) if d]
+            synced.append({
+                "symbol": symbol,
+                "start_date": min(row.start_date, fetch_from) if row else fetch_from,
+                "last_date": max(known_dates) if known_dates else None,
+                "synced_at": now
+            })
+
+    try:
+        upsert(PriceHistory, rows, ["symbol", "date"])
+        upsert(PriceHistorySync, synced, ["symbol"])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def get_daily_history(symbols, days):
+    """Returns {symbol: [daily bars, newest first]} covering the last `days` calendar days."""
+    start = date.today() - timedelta(days=days)
+    sync(symbols, start)
+
+    stored = (
+        PriceHistory.query
+        .filter(PriceHistory.symbol.in_(symbols), PriceHistory.date >= start)
+        .order_by(PriceHistory.symbol, PriceHistory.date.desc())
+        .all()
+    )
+
+    histories = {symbol: [] for symbol in symbols}
+    for bar in stored:
+        histories[bar.symbol].append({
+            "date": bar.date.isoformat(),
+            "open": bar.open,
+            "high": bar.high,
+            "low": bar.low,
+            "close": bar.close,
+            "volume": bar.volume
+        })
+    return histories
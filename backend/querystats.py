@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", 200))
+# Requests running more queries than this are logged; N+1 lookups show up here first.
+QUERY_COUNT_WARN = int(os.environ.get("DB_QUERY_COUNT_WARN", 50))
+# Adds a Server-Timing header with each request's query count and DB time.
+TIMING_HEADERS = os.environ.get(
+    "DB_TIMING_HEADERS", "1" if os.environ.get("FLASK_ENV") == "development" else "0"
+) == "1"
+
+_lock = threading.Lock()
+_totals = {"queries": 0, "time_ms": 0.0, "slow_queries": 0, "requests": 0, "busy_requests": 0}
+_engines = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    slow = elapsed >= SLOW_QUERY_MS
+    if slow:
+        print(f"Slow query ({elapsed:.0f} ms): {' '.join(statement.split())[:500]}")
+
+    with _lock:
+        _totals["queries"] += 1
+        _totals["time_ms"] += elapsed
+        _totals["slow_queries"] += slow
+
+    # Pool threads started from a request run in a copy of its context, so their queries count too.
+    if has_request_context():
+        g.setdefault("sql_timings", []).append(elapsed)
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+def instrument(engine):
+    """Times every statement engine runs."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    _engines.append(engine)
+
+def request_stats():
+    """(query count, DB milliseconds) for the current request so far."""
+    timings = g.get("sql_timings") or []
+    return len(timings), sum(timings)
+
+def init_app(app):
+    @app.after_request
+    def record_request(response):
+        count, total = request_stats()
+        busy = count > QUERY_COUNT_WARN
+        if busy:
+            print(f"{request.method} {request.path} ran {count} queries ({total:.0f} ms)")
+        with _lock:
+            _totals["requests"] += 1
+            _totals["busy_requests"] += busy
+
+        if TIMING_HEADERS:
+            response.headers.add("Server-Timing", f'db;dur={total:.1f};desc="{count} queries"')
+        return response
+
+def _pool_stats(pool):
+    if isinstance(pool, QueuePool):
+        return {"size": pool.size(), "checked_in": pool.checkedin(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+    return {"status": pool.status()}
+
+def stats():
+    with _lock:
+        totals = dict(_totals)
+    totals["time_ms"] = round(totals["time_ms"], 1)
+    totals["pools"] = [_pool_stats(engine.pool) for engine in _engines]
+    return totals
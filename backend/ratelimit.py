@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Lower numbers are served first.
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority = ContextVar("upstream_priority", default=INTERACTIVE)
+# When the running pool task was queued; its first token wait is counted from then.
+_queued_at = ContextVar("upstream_queued_at", default=None)
+
+# Tasks per priority queued for a pool worker, which is waiting for an upstream slot too.
+_dispatch_queued = {level: 0 for level in PRIORITY_NAMES}
+_dispatch_lock = threading.Lock()
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+def current_priority():
+    return _priority.get()
+
+@contextmanager
+def priority(level):
+    """Marks every rate-limited call made inside the block (and work it submits to the shared pool) as level."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def queued(fn):
+    """Wraps fn, about to be queued for a pool worker, so its time in the queue shows up in the
+    limiter's stats: as queued while it waits, then as part of its first token wait."""
+    level = current_priority()
+    queued_at = time.monotonic()
+    with _dispatch_lock:
+        _dispatch_queued[level] += 1
+
+    def run(*args, **kwargs):
+        with _dispatch_lock:
+            _dispatch_queued[level] -= 1
+        _queued_at.set(queued_at)
+        return fn(*args, **kwargs)
+    return run
+
+
+class TokenBucket:
+    """Token bucket that hands tokens to waiting callers strictly by priority, then arrival order.
+
+    rate is in tokens per second; a rate of 0 disables limiting. Callers that would wait longer
+    than max_wait seconds give up with RateLimitTimeout instead of piling onto the queue.
+    """
+
+    def __init__(self, rate, burst, max_wait=None):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_wait = max_wait
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._stats = {
+            level: {"granted": 0, "timeouts": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for level in PRIORITY_NAMES
+        }
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, level=None):
+        """Blocks until a token is available for this caller and returns how long it waited,
+        including any time its pool task spent queued for a worker."""
+        if self.rate <= 0:
+            return 0.0
+        level = current_priority() if level is None else level
+
+        start = time.monotonic()
+        deadline = start + self.max_wait if self.max_wait is not None else None
+        waiting_since = _queued_at.get() or start
+        _queued_at.set(None)
+        entry = (level, next(self._seq))
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] == entry and self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        break
+                    if deadline is not None and now >= deadline:
+                        self._waiters.remove(entry)
+                        heapq.heapify(self._waiters)
+                        self._stats[level]["timeouts"] += 1
+                        raise RateLimitTimeout(f"Gave up after waiting {now - start:.1f}s for an upstream slot")
+
+                    # The head of the queue sleeps until its token is due; everyone else until notified.
+                    timeout = (1 - self._tokens) / self.rate if self._waiters[0] == entry else None
+                    if deadline is not None:
+                        timeout = min(timeout, deadline - now) if timeout is not None else deadline - now
+                    self._cond.wait(timeout)
+            finally:
+                self._cond.notify_all()
+
+            waited = time.monotonic() - waiting_since
+            stats = self._stats[level]
+            stats["granted"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+        return waited
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for level, _ in self._waiters:
+                queued[PRIORITY_NAMES[level]] += 1
+            with _dispatch_lock:
+                waiting_for_worker = {PRIORITY_NAMES[level]: count for level, count in _dispatch_queued.items()}
+
+            by_priority = {}
+            for level, stats in self._stats.items():
+                by_priority[PRIORITY_NAMES[level]] = {
+                    "granted": stats["granted"],
+                    "timeouts": stats["timeouts"],
+                    "queued": queued[PRIORITY_NAMES[level]] + waiting_for_worker[PRIORITY_NAMES[level]],
+                    "waiting_for_worker": waiting_for_worker[PRIORITY_NAMES[level]],
+                    "avg_wait_ms": round(1000 * stats["total_wait"] / stats["granted"], 1) if stats["granted"] else 0.0,
+                    "max_wait_ms": round(1000 * stats["max_wait"], 1)
+                }
+
+            return {
+                "rate_per_minute": self.rate * 60,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 2),
+                "queue_depth": len(self._waiters) + sum(waiting_for_worker.values()),
+                "priorities": by_priority
+            }
@@ -0,0 +1,46 @@
+PERIODS = ("week", "month")
+
+
+def last_close_by_period(bars, period, since=None):
+    """Returns the last bar of each ISO week or calendar month as {"date", "close"} points, oldest first.
+
+    bars is a list of {"date": "YYYY-MM-DD", "close": ...} dicts in any order. Dates are parsed once
+    for the whole series; rows with unparseable dates are skipped, and rows before `since`
+    ("YYYY-MM-DD") are ignored.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    if not bars:
+        return []
+
+    # Imported on first use: pandas alone is a large share of the app's import time.
+    import numpy as np
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(bars, columns=["date", "close"])
+    dates = pd.to_datetime(frame["date"], format="%Y-%m-%d", errors="coerce")
+
+    keep = dates.notna().to_numpy()
+    if since is not None:
+        keep = keep & (dates >= pd.Timestamp(since)).to_numpy()
+    frame = frame[keep]
+    dates = dates[keep]
+    if frame.empty:
+        return []
+
+    order = np.argsort(dates.to_numpy(), kind="stable")
+    dates = dates.iloc[order]
+    if period == "week":
+        iso = dates.dt.isocalendar()
+        keys = iso["year"].to_numpy(dtype=np.int64) * 100 + iso["week"].to_numpy(dtype=np.int64)
+    else:
+        keys = dates.dt.year.to_numpy(dtype=np.int64) * 100 + dates.dt.month.to_numpy(dtype=np.int64)
+
+    # Rows are sorted by date, so each bucket is a contiguous run and its
+    # last row is wherever the key changes on the next row.
+    is_last = np.append(keys[1:] != keys[:-1], True)
+    rows = order[is_last]
+
+    date_values = frame["date"].to_numpy()[rows]
+    close_values = frame["close"].fillna(0).to_numpy(dtype=np.float64)[rows]
+    return [{"date": date, "close": float(close)} for date, close in zip(date_values, close_values)]
@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import os
+from functools import wraps
+import msgspec
+from flask import Response, make_response, request
+from caching import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+RESPONSE_MEMO_SIZE = int(os.environ.get("RESPONSE_MEMO_SIZE", 256))
+
+# Sorted keys give the same body jsonify produces for the same data, minus its trailing newline.
+_encoder = msgspec.json.Encoder(order="sorted")
+
+# Cached payloads served from the in-process tier are the same object on every hit, so their
+# encoded body and ETag are kept by identity. The payload itself is stored too, which keeps its
+# id from being reused while the entry lives.
+_encoded = LRUCache(threshold=RESPONSE_MEMO_SIZE, default_timeout=0)
+# Compressed bodies by (ETag, encoding), so unchanged payloads are compressed once.
+_compressed = LRUCache(threshold=RESPONSE_MEMO_SIZE, default_timeout=0)
+
+
+def _etag(body):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def json_response(payload, status=200):
+    """jsonify for large payloads, encoded with msgspec instead of the stdlib json module."""
+    memo_key = str(id(payload))
+    memo = _encoded.get(memo_key)
+    if memo is not None and memo[0] is payload:
+        _, body, etag = memo
+    else:
+        body = _encoder.encode(payload)
+        etag = _etag(body)
+        _encoded.set(memo_key, (payload, body, etag))
+
+    rv = Response(body, status=status, mimetype="application/json")
+    rv.set_etag(etag)
+    return rv
+
+def _negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+def _compress(body, etag, encoding):
+    key = f"{etag}:{encoding}"
+    compressed = _compressed.get(key)
+    if compressed is None:
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        _compressed.set(key, compressed)
+    return compressed
+
+def conditional(f):
+    """Adds an ETag to successful JSON responses, answers a matching If-None-Match with 304, and
+    gzip- or brotli-compresses bodies of at least COMPRESS_MIN_SIZE bytes."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        rv = make_response(f(*args, **kwargs))
+        if rv.status_code != 200 or rv.mimetype != "application/json" or rv.direct_passthrough:
+            return rv
+
+        body = rv.get_data()
+        etag, _ = rv.get_etag()
+        if etag is None:
+            etag = _etag(body)
+
+        encoding = _negotiate_encoding() if len(body) >= COMPRESS_MIN_SIZE else None
+        # Each encoding is a different representation, so it gets its own validator.
+        if encoding:
+            etag = f"{etag}-{encoding}"
+        rv.set_etag(etag)
+        rv.headers["Cache-Control"] = "no-cache"
+        rv.vary.add("Accept-Encoding")
+
+        if request.if_none_match.contains(etag):
+            rv.status_code = 304
+            rv.set_data(b"")
+            del rv.headers["Content-Length"]
+            return rv
+
+        if encoding:
+            rv.set_data(_compress(body, etag, encoding))
+            rv.headers["Content-Encoding"] = encoding
+        return rv
+    return decorated_function
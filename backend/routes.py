@@ -1,11 +1,18 @@
-from flask import Blueprint, jsonify, request, redirect, session, url_for
-from services import get_popular_stocks, get_stocks, get_add_stock, get_users_stocks, get_user_profile, get_search, remove_stock, get_detailed_stock_info
+from flask import Blueprint, Response, jsonify, request, redirect, session, url_for
+from services import get_popular_stocks, get_stocks, get_add_stock, get_users_stocks, get_user_profile, get_search, remove_stock, get_detailed_stock_info, save_stocks, remove_stocks
+from caching import stats as cache_stats
+from responses import conditional
+from auth import AuthError, auth_required, decode_token, forget_user
 from config import get_google_provider_cfg, client, GOOGLE_CLIENT_SECRET, GOOGLE_CLIENT_ID
 import os
 import json
 from functools import wraps
 import jwt
-import requests
+import upstream
+import fmp
+import entities
+import streaming
+import querystats
 import datetime
 from db import db
 from models import User
@@ -22,10 +29,12 @@ SECRET_KEY = os.environ.get("SECRET_KEY")
 FRONTEND_URL = os.environ.get("FRONTEND_URL")
 
 @api.route('/popular_stocks', methods=['GET'])
+@conditional
 def popular_stocks():
     return get_popular_stocks()
 
 @api.route('/stocks', methods=['GET'])
+@conditional
 def stocks():
     stock_symbol = request.args.get('symbol')
     return get_stocks(stock_symbol)
@@ -41,33 +50,84 @@ def save_stock():
         response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 200
 
+    return add_stock()
+
+@auth_required
+def add_stock(user):
     data = request.get_json()
     if not data:
         return jsonify({"error": "No JSON payload provided"}), 400
     stock_symbol = data.get('symbol')
-    return get_add_stock(stock_symbol, SECRET_KEY)
+    return get_add_stock(stock_symbol, user)
 
 @api.route('/delete_stock', methods=['DELETE'])
-def del_stock():
+@auth_required
+def del_stock(user):
     stock_symbol = request.args.get('symbol')
-    return remove_stock(stock_symbol, SECRET_KEY)
+    return remove_stock(stock_symbol, user)
+
+@api.route('/save_stocks', methods=['POST'])
+@auth_required
+def bulk_save_stocks(user):
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "No JSON payload provided"}), 400
+    return save_stocks(data.get('symbols'), user)
+
+@api.route('/delete_stocks', methods=['DELETE'])
+@auth_required
+def bulk_delete_stocks(user):
+    return remove_stocks(request.args.get('symbols', '').split(','), user)
 
 @api.route('/user_stocks')
-def user_stocks():
-    return get_users_stocks(SECRET_KEY)
+@auth_required
+def user_stocks(user):
+    return get_users_stocks(
+        user,
+        request.args.get('limit'),
+        request.args.get('cursor'),
+        request.args.get('fields'),
+        request.args.get('since')
+    )
 
 @api.route('/user_profile')
-def user_profile():
-    return get_user_profile(SECRET_KEY)
+@auth_required
+def user_profile(user):
+    return get_user_profile(user)
 
 @api.route('/search_stock', methods=['GET'])
+@conditional
 def search():
     search = request.args.get('search_stock')
     return get_search(search)
 
 @api.route('/stock_details/<symbol>', methods=['GET'])
+@conditional
 def stock_details(symbol):
-    return get_detailed_stock_info(symbol)
+    return get_detailed_stock_info(symbol, request.args.get('format'))
+
+@api.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "cache": cache_stats(),
+        "fmp_rate_limit": fmp.limiter.stats(),
+        "stream": streaming.poller.stats(),
+        "db": querystats.stats()
+    })
+
+@api.route('/stream/quotes', methods=['GET'])
+def stream_quotes():
+    symbols = entities.normalize_symbols(request.args.get('symbols', '').split(','))
+    if not symbols:
+        return jsonify({"error": "No symbols provided"}), 400
+    if len(symbols) > streaming.MAX_SYMBOLS:
+        return jsonify({"error": f"At most {streaming.MAX_SYMBOLS} symbols can be streamed"}), 400
+
+    return Response(
+        streaming.event_stream(symbols),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api.route('google/login', methods=['GET', 'POST'])
 def login():
@@ -94,7 +154,7 @@ def callback():
         redirect_url=request.base_url,
         code=code
     )
-    token_response = requests.post(
+    token_response = upstream.post(
         token_url,
         headers=headers,
         data=body,
@@ -105,7 +165,7 @@ def callback():
 
     userinfo_endpoint = google_provider_cfg["userinfo_endpoint"]
     uri, headers, body = client.add_token(userinfo_endpoint)
-    userinfo_response = requests.get(uri, headers=headers, data=body)
+    userinfo_response = upstream.get(uri, headers=headers, data=body)
 
     if userinfo_response.json().get("email_verified"):
         unique_id = userinfo_response.json()["sub"]
@@ -125,6 +185,8 @@ def callback():
         db.session.add(user)
         db.session.commit()
 
+    # Tokens issued from here on must resolve to this row, not a cached copy of an earlier one with the same id.
+    forget_user(user.id)
     login_user(user)
 
     token_payload = {
@@ -152,19 +214,15 @@ def logout():
 def token_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get("Authorization")
-        if not token:
+        if not request.headers.get("Authorization"):
             return jsonify({"error": "Token is missing!"}), 401
-        
+
         try:
-            token = token.split("Bearer ")[1]
-            secret_key = os.getenv("SECRET_KEY")
-            decoded_token = jwt.decode(token, secret_key, algorithms=["HS256"])
-            return f(decoded_token, *args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
+            decoded_token = decode_token()
+        except AuthError as e:
+            messages = {"Token expired": "Token has expired!"}
+            return jsonify({"error": messages.get(e.message, "Invalid token!")}), 401
+        return f(decoded_token, *args, **kwargs)
 
     return decorated_function
 
@@ -1,96 +1,74 @@
-from flask import jsonify, request, session
-import pandas as pd
-from models import User, SavedStocks
-from db import db
-import jwt
+from flask import jsonify, session
+from models import SavedStocks
+from db import db, insert_ignore
 import os
 import re
+import json
+import base64
 import time
 import random
-import requests
+import upstream
+import fmp
+import price_store
+import entities
+import watchlist
+import symbol_index
+import sparkline
+from resampling import last_close_by_period
+from sqlalchemy import tuple_
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
-from functools import wraps
-from cachelib.simple import SimpleCache
-
-cache = SimpleCache(threshold=500, default_timeout=300)
-
-def cached(key_prefix):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            cache_key = key_prefix
-            if args:
-                cache_key += "_" + "_".join(str(arg) for arg in args)
-            if kwargs:
-                cache_key += "_" + "_".join(f"{k}_{v}" for k, v in sorted(kwargs.items()))
-            
-            rv = cache.get(cache_key)
-            if rv is not None:
-                return rv
-            
-            rv = f(*args, **kwargs)
-            
-            cache.set(cache_key, rv)
-            return rv
-        return decorated_function
-    return decorator
+from caching import cached, MAX_STALE
+from responses import json_response
+
+BULK_MAX_SYMBOLS = int(os.environ.get("BULK_MAX_SYMBOLS", 500))
+USER_STOCKS_MAX_PAGE = int(os.environ.get("USER_STOCKS_MAX_PAGE", 200))
+STOCK_FIELDS = ('symbol', 'price', 'recommendation', 'change', 'history')
+DELTA_FIELDS = ('price', 'change')
 
-@cached("popular_stocks")
 def get_popular_stocks():
     """Returns a list of the most active stocks with mini chart data."""
+    payload, status = load_popular_stocks()
+    return json_response(payload, status)
+
+# Only successful payloads are cached; an error is retried on the next request, while a stale list is still served.
+@cached("popular_stocks", data_class="movers", max_stale=MAX_STALE, should_cache=lambda rv: rv[1] == 200)
+def load_popular_stocks():
+    """Builds the (payload, status) for popular stocks as plain data so the cache can share it between workers."""
     api_key = os.environ.get("FMP_API_KEY")
     if not api_key:
-        return jsonify({"error": "API key not configured"}), 500
+        return {"error": "API key not configured"}, 500
         
     try:
-        active_url = f"https://financialmodelingprep.com/api/v3/stock_market/actives?apikey={api_key}"
-        active_response = requests.get(active_url)
-        active_stocks = active_response.json()
+        active_stocks = fmp.get_json("v3/stock_market/actives", "movers")
         
         if not active_stocks or not isinstance(active_stocks, list):
-            return jsonify({"error": "Could not retrieve active stocks"}), 500
+            return {"error": "Could not retrieve active stocks"}, 500
             
         active_stocks = active_stocks[4:8]
         
         stocks_list = []
         symbols = [stock.get('symbol') for stock in active_stocks]
         
+        try:
+            chart_histories = price_store.get_daily_history(symbols, 56)
+        except Exception as e:
+            print(f"Error fetching chart data for {','.join(symbols)}: {str(e)}")
+            chart_histories = {}
+        
         for stock_data in active_stocks:
             symbol = stock_data.get('symbol')
             
             mini_chart_data = {"timestamps": [], "prices": []}
             try:
-                chart_url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}?from={(datetime.now() - timedelta(days=56)).strftime('%Y-%m-%d')}&to={datetime.now().strftime('%Y-%m-%d')}&apikey={api_key}"
-                chart_response = requests.get(chart_url)
-                chart_data = chart_response.json()
+                chart_history = chart_histories.get(symbol)
                 
-                if chart_data and "historical" in chart_data and isinstance(chart_data["historical"], list):
-                    timestamps = []
-                    prices = []
-                    
-                    weekly_data = []
-                    current_week = -1
-                    
-                    sorted_data = sorted(chart_data["historical"], key=lambda x: x.get("date", ""), reverse=True)
-                    
-                    for item in sorted_data:
-                        date_str = item.get("date", "")
-                        try:
-                            dt = datetime.strptime(date_str, "%Y-%m-%d")
-                            week_number = dt.isocalendar()[1]
-                            
-                            if week_number != current_week and len(weekly_data) < 8:
-                                current_week = week_number
-                                weekly_data.append(item)
-                        except Exception as e:
-                            print(f"Error processing date {date_str} for {symbol}: {str(e)}")
-                    
-                    for item in reversed(weekly_data):
-                        date_str = item.get("date", "")
-                        timestamps.append(date_str)
-                        prices.append(item.get("close", 0))
-                            
+                if chart_history:
+                    weekly_data = last_close_by_period(chart_history, "week")[-8:]
+                    timestamps, prices = sparkline.downsample_series(
+                        [item["date"] for item in weekly_data],
+                        [item["close"] for item in weekly_data]
+                    )
                     mini_chart_data = {"timestamps": timestamps, "prices": prices}
             except Exception as e:
                 print(f"Error fetching chart data for {symbol}: {str(e)}")
@@ -106,11 +84,10 @@ def get_popular_stocks():
             
             stocks_list.append(stock_info)
         
-        return jsonify(stocks_list)
+        return stocks_list, 200
     except Exception as e:
-        return jsonify({"error": f"Failed to retrieve stock data: {str(e)}"}), 500
+        return {"error": f"Failed to retrieve stock data: {str(e)}"}, 500
 
-@cached("stocks")
 def get_stocks(user_search):
     if not user_search:
         return {
@@ -131,14 +108,12 @@ def get_stocks(user_search):
             'history': []
         }
         
-    symbol = user_search.upper()
+    symbol = user_search.strip().upper()
     
     try:
-        quote_url = f"https://financialmodelingprep.com/api/v3/quote/{symbol}?apikey={api_key}"
-        quote_response = requests.get(quote_url)
-        quote_data = quote_response.json()
+        quote = entities.get_quotes([symbol]).get(symbol)
         
-        if not quote_data or not isinstance(quote_data, list) or len(quote_data) == 0:
+        if not quote:
             return {
                 'symbol': symbol,
                 'price': 0,
@@ -147,31 +122,11 @@ def get_stocks(user_search):
                 'history': []
             }
         
-        stock_price = quote_data[0].get('price', 0)
-        change_percentage = quote_data[0].get('changesPercentage', 0)
-        
-        history_url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}?timeseries=30&apikey={api_key}"
-        history_response = requests.get(history_url)
-        history_data = history_response.json()
+        stock_price = quote.get('price', 0)
+        change_percentage = quote.get('changesPercentage', 0)
         
-        history_list = []
-        if 'historical' in history_data:
-            for item in history_data['historical'][:30]:
-                history_list.append({
-                    "date": item.get("date", ""),
-                    "price": item.get("close", 0)
-                })
-        
-        recommendation = "NONE"
-        rating_url = f"https://financialmodelingprep.com/api/v3/rating/{symbol}?apikey={api_key}"
-        try:
-            rating_response = requests.get(rating_url)
-            rating_data = rating_response.json()
-            if rating_data and isinstance(rating_data, list) and len(rating_data) > 0:
-                recommendation = rating_data[0].get('ratingRecommendation', 'NONE')
-                
-        except Exception as e:
-            print(f"Error fetching rating for {symbol}: {str(e)}")
+        history_list = entities.get_histories([symbol]).get(symbol, [])
+        recommendation = entities.get_ratings([symbol]).get(symbol, "NONE")
             
         stock_data = {
             'symbol': symbol,
@@ -192,107 +147,68 @@ def get_stocks(user_search):
             'history': []
         }
 
-@cached("multiple_stocks")
-def get_multiple_stocks(symbols):
+def _select_fields(stock_info, fields):
+    if fields is None:
+        return stock_info
+    return {field: value for field, value in stock_info.items() if field == 'symbol' or field in fields}
+
+def get_multiple_stocks(symbols, fields=None):
+    """Returns current info per symbol; with fields, only those keys are filled in and looked up."""
     if not symbols:
         return {}
-        
-    api_key = os.environ.get("FMP_API_KEY")
-    if not api_key:
-        return {symbol: {
+
+    def empty_info(symbol):
+        return _select_fields({
             'symbol': symbol,
             'price': 0,
             'recommendation': None,
             'change': 0,
             'history': []
-        } for symbol in symbols}
+        }, fields)
+        
+    api_key = os.environ.get("FMP_API_KEY")
+    if not api_key:
+        return {symbol: empty_info(symbol) for symbol in symbols}
         
-    url = f"https://financialmodelingprep.com/api/v3/quote/{','.join(symbols)}?apikey={api_key}"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
+        quotes = entities.get_quotes(symbols)
         
-        if not data or not isinstance(data, list):
-            return {symbol: {
-                'symbol': symbol,
-                'price': 0,
-                'recommendation': None,
-                'change': 0,
-                'history': []
-            } for symbol in symbols}
+        if not quotes:
+            return {symbol: empty_info(symbol) for symbol in symbols}
+        
+        quoted_symbols = list(quotes)
+        histories = entities.get_histories(quoted_symbols) if fields is None or 'history' in fields else {}
+        ratings = entities.get_ratings(quoted_symbols) if fields is None or 'recommendation' in fields else {}
         
         stock_data = {}
         
-        for quote in data:
-            symbol = quote.get('symbol')
-            
-            history_url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}?timeseries=30&apikey={api_key}"
-            history_response = requests.get(history_url)
-            history_data = history_response.json()
-            
-            history_list = []
-            if 'historical' in history_data:
-                for item in history_data['historical'][:30]:
-                    history_list.append({
-                        "date": item.get("date", ""),
-                        "price": item.get("close", 0)
-                    })
-            
+        for symbol, quote in quotes.items():
             stock_price = quote.get('price', 0)
             change_percentage = quote.get('changesPercentage', 0)
-            
-            recommendation = "NONE"
-            rating_url = f"https://financialmodelingprep.com/api/v3/rating/{symbol}?apikey={api_key}"
-            try:
-                rating_response = requests.get(rating_url)
-                rating_data = rating_response.json()
-                if rating_data and isinstance(rating_data, list) and len(rating_data) > 0:
-                    recommendation = rating_data[0].get('ratingRecommendation', 'NONE')
-                    
-            except Exception as e:
-                print(f"Error fetching rating for {symbol}: {str(e)}")
+            recommendation = ratings.get(symbol, "NONE")
+            history_list = histories.get(symbol, [])
                 
-            stock_data[symbol] = {
+            stock_data[symbol] = _select_fields({
                 'symbol': symbol,
                 'price': stock_price,
                 'recommendation': recommendation,
                 'change': change_percentage,
                 'history': history_list
-            }
+            }, fields)
         
         return stock_data
     except Exception as e:
         print(f"Error fetching multiple stocks: {str(e)}")
-        return {symbol: {
-            'symbol': symbol,
-            'price': 0,
-            'recommendation': None,
-            'change': 0,
-            'history': []
-        } for symbol in symbols}
+        return {symbol: empty_info(symbol) for symbol in symbols}
 
-def get_add_stock(symbol, SECRET_KEY):
-    if not symbol or symbol.upper() in ["", "EMPTY", "NONE"] or not re.match(r"^[A-Z.\-]+$", symbol.upper()):
+def get_add_stock(symbol, user):
+    # Stored in the same spelling as the bulk endpoint uses, since the unique index is case-sensitive.
+    normalized = entities.normalize_symbols([symbol if isinstance(symbol, str) else ""])
+    symbol = normalized[0] if normalized else ""
+    if not symbol or symbol in ["EMPTY", "NONE"] or not re.match(r"^[A-Z.\-]+$", symbol):
         return jsonify({"success": False, "error": "Invalid stock symbol"}), 400
 
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"success": False, "error": "Missing or invalid token"}), 401
-
-    token = auth_header.split(" ")[1]
-
-    try:
-        decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        google_id = decoded_token.get("google_id")
-    except jwt.ExpiredSignatureError:
-        return jsonify({"success": False, "error": "Token expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"success": False, "error": "Invalid token"}), 401
-
-    user = User.query.filter_by(google_id=google_id).first()
-    if not user:
-        return jsonify({"success": False, "error": "User not found"}), 404
+    google_id = user.google_id
 
     existing_stock = SavedStocks.query.filter_by(google_id=google_id, symbol=symbol).first()
     if existing_stock:
@@ -302,16 +218,12 @@ def get_add_stock(symbol, SECRET_KEY):
     if not api_key:
         return jsonify({"success": False, "error": "API key not configured"}), 500
         
-    url = f"https://financialmodelingprep.com/api/v3/quote/{symbol}?apikey={api_key}"
-    
     try:
-        response = requests.get(url)
-        data = response.json()
+        quote = entities.get_quotes([symbol]).get(symbol)
         
-        if not data or not isinstance(data, list) or len(data) == 0:
+        if not quote:
             return jsonify({"success": False, "error": "Invalid or missing stock data"}), 400
             
-        quote = data[0]
         company_name = quote.get("name") or symbol
         price_at_save = quote.get("price")
         
@@ -326,6 +238,7 @@ def get_add_stock(symbol, SECRET_KEY):
         )
 
         db.session.add(new_stock)
+        watchlist.record_changes(google_id, [symbol], watchlist.ADD)
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
@@ -336,64 +249,127 @@ def get_add_stock(symbol, SECRET_KEY):
 
     return jsonify({"success": True, "message": "Stock saved successfully!", "timestamp": new_stock.date_save})
 
-def get_users_stocks(SECRET_KEY):
-    auth_header = request.headers.get("Authorization")
+def _encode_cursor(stock):
+    return base64.urlsafe_b64encode(json.dumps([stock.date_save.isoformat(), stock.id]).encode()).decode()
 
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"success": False, "error": "Missing or invalid token"}), 401
-    
-    token = auth_header.split(" ")[1]
-    try:
-        decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        google_id = decoded_token.get("google_id")
-    except jwt.ExpiredSignatureError:
-        return jsonify({"success": False, "error": "Token expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"success": False, "error": "Invalid token"}), 401
-    
-    saved_stocks = SavedStocks.query.filter_by(google_id=google_id).all()
+def _decode_cursor(cursor):
+    date_saved, stock_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(date_saved), int(stock_id)
 
-    stock_symbols = [stock.symbol for stock in saved_stocks]
-
-    stocks_data = get_multiple_stocks(stock_symbols)
+def _saved_stock_entry(stock, stocks_data):
+    return {
+        "symbol": stock.symbol,
+        "company_name": stock.company_name,
+        "price_at_save": stock.price_at_save,
+        "date_saved": stock.date_save,
+        "current_info": stocks_data.get(stock.symbol.upper(), {})
+    }
 
-    saved_stocks_list = [
-        {
-            "symbol": stock.symbol,
-            "company_name": stock.company_name,
-            "price_at_save": stock.price_at_save,
-            "date_saved": stock.date_save,
-            "current_info": stocks_data.get(stock.symbol, {})
-        }
-        for stock in saved_stocks
+def _watchlist_delta(user, since, fields):
+    """What changed since a version from an earlier response: added and removed symbols, and the
+    current_info of symbols whose quote moved (price and change only, unless fields says otherwise)."""
+    try:
+        since_change, since_quotes = (int(part) for part in since.split("."))
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid since version"}), 400
+    if watchlist.is_expired(since_quotes):
+        return jsonify({"success": False, "error": "since is too old, fetch the full watchlist again"}), 410
+
+    quotes_version = int(time.time() * 1000)
+    changes, version = watchlist.changes_since(user.google_id, since_change)
+    saved_stocks = SavedStocks.query.filter_by(google_id=user.google_id).order_by(SavedStocks.date_save, SavedStocks.id).all()
+    present = {stock.symbol for stock in saved_stocks}
+
+    added = [stock for stock in saved_stocks if changes.get(stock.symbol) == watchlist.ADD]
+    removed = [symbol for symbol, action in changes.items() if action == watchlist.REMOVE and symbol not in present]
+    unchanged = [stock.symbol for stock in saved_stocks if stock.symbol not in changes]
+
+    # Refresh any expired quotes first so their versions reflect the latest prices.
+    entities.get_quotes(unchanged)
+    quote_versions = entities.get_quote_versions(unchanged)
+    moved = [
+        symbol for symbol in unchanged
+        if quote_versions.get(symbol.upper()) is None or quote_versions[symbol.upper()] > since_quotes
     ]
 
-    return jsonify({"success": True, "saved_stocks": saved_stocks_list})
+    added_data = get_multiple_stocks([stock.symbol for stock in added], fields)
+    moved_data = get_multiple_stocks(moved, fields if fields is not None else DELTA_FIELDS)
+
+    return jsonify({
+        "success": True,
+        "version": f"{version}.{quotes_version}",
+        "added": [_saved_stock_entry(stock, added_data) for stock in added],
+        "removed": removed,
+        "changed": [{"symbol": symbol, "current_info": moved_data.get(symbol.upper(), {})} for symbol in moved]
+    })
+
+def get_users_stocks(user, limit=None, cursor=None, fields=None, since=None):
+    """Returns the user's watchlist oldest first, with a version for later delta requests.
+
+    With limit, returns one page plus a next_cursor to pass back for the following page (null on
+    the last one). fields is a comma-separated subset of STOCK_FIELDS for current_info; history
+    and ratings are only looked up when asked for, and only for the symbols on the page. With
+    since, returns only what changed after that version instead, or 410 if that version is older
+    than the change history kept.
+    """
+    if fields is not None:
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in STOCK_FIELDS]
+        if unknown:
+            return jsonify({"success": False, "error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    if since is not None:
+        if limit is not None or cursor:
+            return jsonify({"success": False, "error": "since cannot be combined with limit or cursor"}), 400
+        return _watchlist_delta(user, since, fields)
+
+    quotes_version = int(time.time() * 1000)
+    version = watchlist.current_version(user.google_id)
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= USER_STOCKS_MAX_PAGE:
+            return jsonify({"success": False, "error": f"limit must be between 1 and {USER_STOCKS_MAX_PAGE}"}), 400
+
+    query = SavedStocks.query.filter_by(google_id=user.google_id)
+    if cursor:
+        try:
+            after = _decode_cursor(cursor)
+        except (ValueError, TypeError):
+            return jsonify({"success": False, "error": "Invalid cursor"}), 400
+        query = query.filter(tuple_(SavedStocks.date_save, SavedStocks.id) > after)
+    query = query.order_by(SavedStocks.date_save, SavedStocks.id)
+
+    next_cursor = None
+    if limit is not None:
+        saved_stocks = query.limit(limit + 1).all()
+        if len(saved_stocks) > limit:
+            saved_stocks = saved_stocks[:limit]
+            next_cursor = _encode_cursor(saved_stocks[-1])
+    else:
+        saved_stocks = query.all()
 
-def get_user_profile(SECRET_KEY):
-    auth_header = request.headers.get("Authorization")
+    stock_symbols = [stock.symbol for stock in saved_stocks]
 
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"success": False, "error": "Missing or invalid token"}), 401
-    
-    token = auth_header.split(" ")[1]
+    stocks_data = get_multiple_stocks(stock_symbols, fields)
 
-    try:
-        decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        google_id = decoded_token.get("google_id")
-    except jwt.ExpiredSignatureError:
-        return jsonify({"success": False, "error": "Token expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"success": False, "error": "Invalid token"}), 401
-    
-    user_profile = User.query.filter_by(google_id=google_id).first()
+    saved_stocks_list = [_saved_stock_entry(stock, stocks_data) for stock in saved_stocks]
 
+    response = {"success": True, "saved_stocks": saved_stocks_list, "version": f"{version}.{quotes_version}"}
+    if limit is not None:
+        response["next_cursor"] = next_cursor
+    return jsonify(response)
+
+def get_user_profile(user):
     user_info = {
-        "google_id": user_profile.google_id,
-        "username": user_profile.name,
-        "email": user_profile.email,
-        "profile_picture": user_profile.profile_picture,
-        "created_at": user_profile.created_at
+        "google_id": user.google_id,
+        "username": user.name,
+        "email": user.email,
+        "profile_picture": user.profile_picture,
+        "created_at": user.created_at
     }
 
     return jsonify(user_info)
@@ -407,9 +383,10 @@ def get_search(user_search):
         return jsonify({'quotes': []})
     
     try:
-        search_url = f"https://financialmodelingprep.com/api/v3/search?query={user_search}&limit=10&apikey={api_key}"
-        search_response = requests.get(search_url)
-        search_results = search_response.json()
+        search_results = symbol_index.search(user_search, limit=10)
+        if search_results is None:
+            # The symbol directory is still loading; ask FMP to search instead.
+            search_results = fmp.get_json("v3/search", "search", query=user_search, limit=10)
         
         if not search_results or not isinstance(search_results, list):
             return jsonify({'quotes': []})
@@ -419,14 +396,12 @@ def get_search(user_search):
         if not symbols:
             return jsonify({'quotes': []})
             
-        quotes_url = f"https://financialmodelingprep.com/api/v3/quote/{','.join(symbols)}?apikey={api_key}"
-        quotes_response = requests.get(quotes_url)
-        quotes_data = quotes_response.json()
+        quotes_map = entities.get_quotes(symbols)
         
-        if not quotes_data or not isinstance(quotes_data, list):
+        if not quotes_map:
             return jsonify({'quotes': []})
-            
-        quotes_map = {quote.get('symbol'): quote for quote in quotes_data}
+        
+        sparklines = entities.get_sparklines([symbol for symbol in symbols if symbol in quotes_map])
         
         search_data = []
         
@@ -437,16 +412,7 @@ def get_search(user_search):
                 
             quote = quotes_map[symbol]
             
-            chart_data = []
-            try:
-                chart_url = f"https://financialmodelingprep.com/api/v3/historical-chart/1hour/{symbol}?apikey={api_key}"
-                chart_response = requests.get(chart_url)
-                chart_results = chart_response.json()
-                
-                if chart_results and isinstance(chart_results, list):
-                    chart_data = [item.get('close', 0) for item in chart_results][::-1]
-            except Exception as e:
-                print(f"Error fetching chart data for {symbol}: {str(e)}")
+            chart_data = sparklines.get(symbol.upper(), [])
                 
             temp = {
                 "symbol": symbol,
@@ -468,33 +434,103 @@ def get_search(user_search):
         print(f"Error in search: {str(e)}")
         return jsonify({'quotes': []})
 
-def remove_stock(stock_symbol, SECRET_KEY):
-    auth_header = request.headers.get("Authorization")
-
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return jsonify({"success": False, "error": "Missing or invalid token"}), 401
-    
-    token = auth_header.split(" ")[1]
-
-    try:
-        decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        google_id = decoded_token.get("google_id")
-    except jwt.ExpiredSignatureError:
-        return jsonify({"success": False, "error": "Token expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"success": False, "error": "Invalid token"}), 401
-    
-    stock = SavedStocks.query.filter_by(google_id=google_id, symbol=stock_symbol).first()
+def remove_stock(stock_symbol, user):
+    normalized = entities.normalize_symbols([stock_symbol])
+    stock_symbol = normalized[0] if normalized else ""
+    stock = SavedStocks.query.filter_by(google_id=user.google_id, symbol=stock_symbol).first()
     if stock:
         db.session.delete(stock)
+        watchlist.record_changes(user.google_id, [stock.symbol], watchlist.REMOVE)
         db.session.commit()
         return {'message': f'{stock_symbol} deleted'}
     else:
         return {'error': 'Stock not found'}, 404
 
-def get_detailed_stock_info(stock_symbol):
+def save_stocks(symbols, user):
+    """Adds many symbols to the user's watchlist with one batched quote lookup and one insert."""
+    if not isinstance(symbols, list) or not symbols:
+        return jsonify({"success": False, "error": "symbols must be a non-empty list"}), 400
+    if len(symbols) > BULK_MAX_SYMBOLS:
+        return jsonify({"success": False, "error": f"At most {BULK_MAX_SYMBOLS} symbols per request"}), 400
+
+    symbols = entities.normalize_symbols(symbol if isinstance(symbol, str) else "" for symbol in symbols)
+    invalid = [symbol for symbol in symbols if symbol in ["EMPTY", "NONE"] or not re.match(r"^[A-Z.\-]+$", symbol)]
+    symbols = [symbol for symbol in symbols if symbol not in invalid]
+
+    api_key = os.environ.get("FMP_API_KEY")
+    if not api_key:
+        return jsonify({"success": False, "error": "API key not configured"}), 500
+
+    existing = {
+        row.symbol for row in
+        SavedStocks.query.with_entities(SavedStocks.symbol)
+        .filter(SavedStocks.google_id == user.google_id, SavedStocks.symbol.in_(symbols))
+    }
+    to_save = [symbol for symbol in symbols if symbol not in existing]
+
+    try:
+        quotes = entities.get_quotes(to_save) if to_save else {}
+        now = datetime.utcnow()
+        rows = []
+        for symbol in to_save:
+            quote = quotes.get(symbol)
+            if not quote or not quote.get("price"):
+                invalid.append(symbol)
+                continue
+            rows.append({
+                "google_id": user.google_id,
+                "symbol": symbol,
+                "company_name": quote.get("name") or symbol,
+                "price_at_save": quote.get("price"),
+                "date_save": now
+            })
+
+        # Rows saved concurrently by another request are skipped rather than failing the batch.
+        insert_ignore(SavedStocks, rows, ["google_id", "symbol"])
+        watchlist.record_changes(user.google_id, [row["symbol"] for row in rows], watchlist.ADD)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": f"Failed to save stocks: {str(e)}"}), 500
+
+    return jsonify({
+        "success": True,
+        "saved": [row["symbol"] for row in rows],
+        "already_saved": [symbol for symbol in symbols if symbol in existing],
+        "invalid": invalid
+    })
+
+def remove_stocks(symbols, user):
+    """Removes many symbols from the user's watchlist in one statement."""
+    symbols = entities.normalize_symbols(symbols)
+    if not symbols:
+        return jsonify({"success": False, "error": "No symbols provided"}), 400
+    if len(symbols) > BULK_MAX_SYMBOLS:
+        return jsonify({"success": False, "error": f"At most {BULK_MAX_SYMBOLS} symbols per request"}), 400
+
+    matching = SavedStocks.query.filter(SavedStocks.google_id == user.google_id, SavedStocks.symbol.in_(symbols))
+    deleted_symbols = [row.symbol for row in matching.with_entities(SavedStocks.symbol)]
+    deleted = matching.delete(synchronize_session=False)
+    watchlist.record_changes(user.google_id, deleted_symbols, watchlist.REMOVE)
+    db.session.commit()
+    return jsonify({"success": True, "deleted": deleted})
+
+def columnar_history(historical_data):
+    """Turns each range's list of {"date", "close"} points into parallel "dates" and "close" arrays."""
+    return {
+        name: {
+            "interval": series["interval"],
+            "dates": [point["date"] for point in series["data"]],
+            "close": [point["close"] for point in series["data"]]
+        }
+        for name, series in historical_data.items()
+    }
+
+def get_detailed_stock_info(stock_symbol, response_format=None):
     if not stock_symbol or not isinstance(stock_symbol, str):
         return jsonify({"success": False, "error": "Invalid stock symbol"}), 400
+    if response_format not in (None, "rows", "columnar"):
+        return jsonify({"success": False, "error": "format must be rows or columnar"}), 400
 
     symbol = stock_symbol.upper()
     api_key = os.environ.get("FMP_API_KEY")
@@ -507,40 +543,26 @@ def get_detailed_stock_info(stock_symbol):
         }), 500
     
     try:
-        detailed_data = {
+        detailed_data = load_detailed_stock_info(symbol)
+        if response_format == "columnar":
+            # The cached payload is shared, so build a new top-level dict rather than editing it.
+            detailed_data = dict(detailed_data, historical_data=columnar_history(detailed_data["historical_data"]))
+        return json_response(detailed_data)
+    except Exception as e:
+        error_response = {
             "success": True,
             "symbol": symbol,
-            "company_info": {
-                "name": symbol,
-                "sector": "",
-                "industry": "",
-                "website": "",
-                "description": "",
-                "exchange": "",
-                "market_cap": 0,
-                "employees": 0
-            },
+            "error_info": str(e),
+            "company_info": {"name": symbol, "sector": "", "industry": "", "exchange": "", "market_cap": 0, "employees": 0},
             "price_data": {
-                "current_price": 0,
-                "previous_close": 0,
-                "open": 0,
-                "day_high": 0,
-                "day_low": 0,
-                "day_change": 0,
-                "day_change_percent": 0,
-                "52wk_high": 0,
-                "52wk_low": 0,
-                "volume": 0
+                "current_price": 0, "previous_close": 0, "open": 0,
+                "day_high": 0, "day_low": 0, "day_change": 0, "day_change_percent": 0,
+                "52wk_high": 0, "52wk_low": 0, "volume": 0
             },
             "financial_metrics": {
-                "pe_ratio": 0,
-                "eps": 0,
-                "dividend_yield": 0,
-                "dividend_rate": 0,
-                "profit_margin": 0,
-                "beta": 0,
-                "recommendation": "NONE",
-                "target_price": 0
+                "pe_ratio": 0, "eps": 0, "dividend_yield": 0, 
+                "dividend_rate": 0, "profit_margin": 0, "beta": 0,
+                "recommendation": "NONE", "target_price": 0
             },
             "historical_data": {
                 "1d": {"interval": "15m", "data": []},
@@ -549,265 +571,237 @@ def get_detailed_stock_info(stock_symbol):
                 "5y": {"interval": "1mo", "data": []}
             }
         }
+        if response_format == "columnar":
+            error_response["historical_data"] = columnar_history(error_response["historical_data"])
+        return jsonify(error_response)
+
+@cached("stock_details", data_class="quote", max_stale=MAX_STALE)
+def load_detailed_stock_info(symbol):
+    """Builds the detail payload for an upper-case symbol; errors propagate so they are never cached."""
+    detailed_data = {
+        "success": True,
+        "symbol": symbol,
+        "company_info": {
+            "name": symbol,
+            "sector": "",
+            "industry": "",
+            "website": "",
+            "description": "",
+            "exchange": "",
+            "market_cap": 0,
+            "employees": 0
+        },
+        "price_data": {
+            "current_price": 0,
+            "previous_close": 0,
+            "open": 0,
+            "day_high": 0,
+            "day_low": 0,
+            "day_change": 0,
+            "day_change_percent": 0,
+            "52wk_high": 0,
+            "52wk_low": 0,
+            "volume": 0
+        },
+        "financial_metrics": {
+            "pe_ratio": 0,
+            "eps": 0,
+            "dividend_yield": 0,
+            "dividend_rate": 0,
+            "profit_margin": 0,
+            "beta": 0,
+            "recommendation": "NONE",
+            "target_price": 0
+        },
+        "historical_data": {
+            "1d": {"interval": "15m", "data": []},
+            "1mo": {"interval": "1d", "data": []},
+            "1y": {"interval": "1wk", "data": []},
+            "5y": {"interval": "1mo", "data": []}
+        }
+    }
+    
+    today = datetime.now()
+    requests_by_name = {
+        "key_metrics": (f"v3/key-metrics/{symbol}", "fundamentals", {"limit": 1}),
+        "ratios": (f"v3/ratios/{symbol}", "fundamentals", {"limit": 1}),
+        "price_target": ("v4/price-target", "price_target", {"symbol": symbol}),
+        "intraday": (f"v3/historical-chart/5min/{symbol}", "intraday", {}),
+    }
+    # The upstream calls are independent of each other, so start them all
+    # at once and merge the results below in the original order.
+    futures = {
+        name: upstream.submit(fmp.get_json, path, data_class, **params)
+        for name, (path, data_class, params) in requests_by_name.items()
+    }
+    futures["quote"] = upstream.submit(entities.get_quotes, [symbol])
+    futures["profile"] = upstream.submit(entities.get_profiles, [symbol])
+    futures["rating"] = upstream.submit(entities.get_ratings, [symbol])
+    
+    # The 5-year daily series contains the 1-month and 1-year ranges too,
+    # so read it once from the price store and derive every view from it.
+    daily_history = None
+    try:
+        daily_history = price_store.get_daily_history([symbol], 365*5)[symbol]
+    except Exception as e:
+        print(f"Error fetching daily history for {symbol}: {str(e)}")
+    
+    quote = futures["quote"].result().get(symbol)
+    
+    if quote:
+        current_price = quote.get("price", 0)
+        previous_close = quote.get("previousClose", current_price)
         
-        quote_url = f"https://financialmodelingprep.com/api/v3/quote/{symbol}?apikey={api_key}"
-        quote_response = requests.get(quote_url)
-        quote_data = quote_response.json()
-        
-        if quote_data and isinstance(quote_data, list) and len(quote_data) > 0:
-            quote = quote_data[0]
-            current_price = quote.get("price", 0)
-            previous_close = quote.get("previousClose", current_price)
-            
-            if current_price and previous_close:
-                day_change = current_price - previous_close
-                day_change_percent = (day_change / previous_close) * 100 if previous_close else 0
-                
-                detailed_data["price_data"].update({
-                    "current_price": current_price,
-                    "previous_close": previous_close,
-                    "open": quote.get("open", current_price),
-                    "day_high": quote.get("dayHigh", current_price),
-                    "day_low": quote.get("dayLow", current_price),
-                    "day_change": day_change,
-                    "day_change_percent": day_change_percent,
-                    "volume": quote.get("volume", 0),
-                    "52wk_high": quote.get("yearHigh", 0),
-                    "52wk_low": quote.get("yearLow", 0)
-                })
-        
-        profile_url = f"https://financialmodelingprep.com/api/v3/profile/{symbol}?apikey={api_key}"
-        profile_response = requests.get(profile_url)
-        profile_data = profile_response.json()
-        
-        if profile_data and isinstance(profile_data, list) and len(profile_data) > 0:
-            profile = profile_data[0]
+        if current_price and previous_close:
+            day_change = current_price - previous_close
+            day_change_percent = (day_change / previous_close) * 100 if previous_close else 0
             
-            detailed_data["company_info"].update({
-                "name": profile.get("companyName") or symbol,
-                "sector": profile.get("sector", ""),
-                "industry": profile.get("industry", ""),
-                "website": profile.get("website", ""),
-                "description": profile.get("description", ""),
-                "exchange": profile.get("exchange", ""),
-                "market_cap": profile.get("mktCap", 0),
-                "employees": profile.get("fullTimeEmployees", 0)
+            detailed_data["price_data"].update({
+                "current_price": current_price,
+                "previous_close": previous_close,
+                "open": quote.get("open", current_price),
+                "day_high": quote.get("dayHigh", current_price),
+                "day_low": quote.get("dayLow", current_price),
+                "day_change": day_change,
+                "day_change_percent": day_change_percent,
+                "volume": quote.get("volume", 0),
+                "52wk_high": quote.get("yearHigh", 0),
+                "52wk_low": quote.get("yearLow", 0)
             })
+    
+    profile = futures["profile"].result().get(symbol)
+    
+    if profile:
+        
+        detailed_data["company_info"].update({
+            "name": profile.get("companyName") or symbol,
+            "sector": profile.get("sector", ""),
+            "industry": profile.get("industry", ""),
+            "website": profile.get("website", ""),
+            "description": profile.get("description", ""),
+            "exchange": profile.get("exchange", ""),
+            "market_cap": profile.get("mktCap", 0),
+            "employees": profile.get("fullTimeEmployees", 0)
+        })
+        
+        beta = profile.get("beta", 0)
+        
+        if not detailed_data["price_data"]["volume"]:
+            detailed_data["price_data"]["volume"] = profile.get("volume", 0)
             
-            beta = profile.get("beta", 0)
+        if not detailed_data["price_data"]["52wk_high"]:
+            detailed_data["price_data"]["52wk_high"] = profile.get("yearHigh", 0)
             
-            if not detailed_data["price_data"]["volume"]:
-                detailed_data["price_data"]["volume"] = profile.get("volume", 0)
-                
-            if not detailed_data["price_data"]["52wk_high"]:
-                detailed_data["price_data"]["52wk_high"] = profile.get("yearHigh", 0)
-                
-            if not detailed_data["price_data"]["52wk_low"]:
-                detailed_data["price_data"]["52wk_low"] = profile.get("yearLow", 0)
-                
-            current_price = detailed_data["price_data"]["current_price"] or profile.get("price", 0)
-            div_yield = 0
-            if profile.get("lastDiv", 0) > 0 and current_price > 0:
-                div_yield = (profile.get("lastDiv", 0) / current_price) * 100
-                
-            detailed_data["financial_metrics"].update({
-                "pe_ratio": profile.get("pe", 0),
-                "eps": profile.get("eps", 0),
-                "dividend_yield": div_yield,
-                "dividend_rate": profile.get("lastDiv", 0),
-                "profit_margin": profile.get("profitMargin", 0),
-                "beta": beta
-            })
+        if not detailed_data["price_data"]["52wk_low"]:
+            detailed_data["price_data"]["52wk_low"] = profile.get("yearLow", 0)
             
-        key_metrics_url = f"https://financialmodelingprep.com/api/v3/key-metrics/{symbol}?limit=1&apikey={api_key}"
-        key_metrics_response = requests.get(key_metrics_url)
-        key_metrics_data = key_metrics_response.json()
-        
-        if key_metrics_data and isinstance(key_metrics_data, list) and len(key_metrics_data) > 0:
-            metrics = key_metrics_data[0]
+        current_price = detailed_data["price_data"]["current_price"] or profile.get("price", 0)
+        div_yield = 0
+        if profile.get("lastDiv", 0) > 0 and current_price > 0:
+            div_yield = (profile.get("lastDiv", 0) / current_price) * 100
             
-            if not detailed_data["financial_metrics"]["pe_ratio"] or detailed_data["financial_metrics"]["pe_ratio"] == 0:
-                detailed_data["financial_metrics"]["pe_ratio"] = metrics.get("peRatio", 0) or 0
-                
-            if not detailed_data["financial_metrics"]["eps"] or detailed_data["financial_metrics"]["eps"] == 0:
-                detailed_data["financial_metrics"]["eps"] = metrics.get("netIncomePerShare", 0) or 0
-                
-            if not detailed_data["financial_metrics"]["profit_margin"] or detailed_data["financial_metrics"]["profit_margin"] == 0:
-                detailed_data["financial_metrics"]["profit_margin"] = metrics.get("netProfitMargin", 0) or 0
-        
-        ratios_url = f"https://financialmodelingprep.com/api/v3/ratios/{symbol}?limit=1&apikey={api_key}"
-        ratios_response = requests.get(ratios_url)
-        ratios_data = ratios_response.json()
+        detailed_data["financial_metrics"].update({
+            "pe_ratio": profile.get("pe", 0),
+            "eps": profile.get("eps", 0),
+            "dividend_yield": div_yield,
+            "dividend_rate": profile.get("lastDiv", 0),
+            "profit_margin": profile.get("profitMargin", 0),
+            "beta": beta
+        })
+        
+    key_metrics_data = futures["key_metrics"].result()
+    
+    if key_metrics_data and isinstance(key_metrics_data, list) and len(key_metrics_data) > 0:
+        metrics = key_metrics_data[0]
         
-        if ratios_data and isinstance(ratios_data, list) and len(ratios_data) > 0:
-            ratios = ratios_data[0]
+        if not detailed_data["financial_metrics"]["pe_ratio"] or detailed_data["financial_metrics"]["pe_ratio"] == 0:
+            detailed_data["financial_metrics"]["pe_ratio"] = metrics.get("peRatio", 0) or 0
             
-            if not detailed_data["financial_metrics"]["pe_ratio"] or detailed_data["financial_metrics"]["pe_ratio"] == 0:
-                detailed_data["financial_metrics"]["pe_ratio"] = ratios.get("priceEarningsRatio", 0) or 0
-                
-            if not detailed_data["financial_metrics"]["eps"] or detailed_data["financial_metrics"]["eps"] == 0:
-                eps_ttm = ratios.get("priceToBookRatio", 0) / ratios.get("priceEarningsRatio", 1) if ratios.get("priceEarningsRatio", 0) > 0 else 0
-                if eps_ttm > 0:
-                    detailed_data["financial_metrics"]["eps"] = eps_ttm
-                    
-            if not detailed_data["financial_metrics"]["dividend_yield"] or detailed_data["financial_metrics"]["dividend_yield"] == 0:
-                detailed_data["financial_metrics"]["dividend_yield"] = ratios.get("dividendYield", 0) * 100 or 0
-                
-            if not detailed_data["financial_metrics"]["profit_margin"] or detailed_data["financial_metrics"]["profit_margin"] == 0:
-                detailed_data["financial_metrics"]["profit_margin"] = ratios.get("netProfitMargin", 0) or 0
+        if not detailed_data["financial_metrics"]["eps"] or detailed_data["financial_metrics"]["eps"] == 0:
+            detailed_data["financial_metrics"]["eps"] = metrics.get("netIncomePerShare", 0) or 0
             
-        recommendations_url = f"https://financialmodelingprep.com/api/v3/rating/{symbol}?apikey={api_key}"
-        recommendations_response = requests.get(recommendations_url)
-        recommendations_data = recommendations_response.json()
-        
-        if recommendations_data and isinstance(recommendations_data, list) and len(recommendations_data) > 0:
-            recommendation = recommendations_data[0].get('ratingRecommendation', 'NONE')
-            detailed_data["financial_metrics"]["recommendation"] = recommendation
-                        
-        price_target_url = f"https://financialmodelingprep.com/api/v4/price-target?symbol={symbol}&apikey={api_key}"
-        price_target_response = requests.get(price_target_url)
-        price_target_data = price_target_response.json()
-        
-        if price_target_data and isinstance(price_target_data, list) and len(price_target_data) > 0:
-            detailed_data["financial_metrics"]["target_price"] = price_target_data[0].get("priceTarget", 0)
+        if not detailed_data["financial_metrics"]["profit_margin"] or detailed_data["financial_metrics"]["profit_margin"] == 0:
+            detailed_data["financial_metrics"]["profit_margin"] = metrics.get("netProfitMargin", 0) or 0
+    
+    ratios_data = futures["ratios"].result()
+    
+    if ratios_data and isinstance(ratios_data, list) and len(ratios_data) > 0:
+        ratios = ratios_data[0]
         
-        try:
-            intraday_url = f"https://financialmodelingprep.com/api/v3/historical-chart/5min/{symbol}?apikey={api_key}"
-            intraday_response = requests.get(intraday_url)
-            intraday_data = intraday_response.json()
+        if not detailed_data["financial_metrics"]["pe_ratio"] or detailed_data["financial_metrics"]["pe_ratio"] == 0:
+            detailed_data["financial_metrics"]["pe_ratio"] = ratios.get("priceEarningsRatio", 0) or 0
             
-            if isinstance(intraday_data, list):
-                intraday_data = sorted(intraday_data, key=lambda x: x.get("date", ""))
-                
-                recent_day_data = intraday_data[-78:] if len(intraday_data) > 78 else intraday_data
-                
-                daily_points = []
-                for item in recent_day_data:
-                    date_str = item.get("date", "")
-                    close_price = item.get("close", 0)
-                    
-                    daily_points.append({
-                        "date": date_str,
-                        "close": float(close_price)
-                    })
+        if not detailed_data["financial_metrics"]["eps"] or detailed_data["financial_metrics"]["eps"] == 0:
+            eps_ttm = ratios.get("priceToBookRatio", 0) / ratios.get("priceEarningsRatio", 1) if ratios.get("priceEarningsRatio", 0) > 0 else 0
+            if eps_ttm > 0:
+                detailed_data["financial_metrics"]["eps"] = eps_ttm
                 
-                detailed_data["historical_data"]["1d"]["data"] = daily_points
-                detailed_data["historical_data"]["1d"]["interval"] = "5min"
-        except Exception as e:
-            print(f"Error fetching intraday data for {symbol}: {str(e)}")
-        
-        try:
-            monthly_url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}?timeseries=30&apikey={api_key}"
-            monthly_response = requests.get(monthly_url)
-            monthly_data = monthly_response.json()
+        if not detailed_data["financial_metrics"]["dividend_yield"] or detailed_data["financial_metrics"]["dividend_yield"] == 0:
+            detailed_data["financial_metrics"]["dividend_yield"] = ratios.get("dividendYield", 0) * 100 or 0
             
-            if "historical" in monthly_data and isinstance(monthly_data["historical"], list):
-                monthly_points = []
-                for item in monthly_data["historical"]:
-                    date_str = item.get("date", "")
-                    close_price = item.get("close", 0)
-                    
-                    monthly_points.append({
-                        "date": date_str,
-                        "close": float(close_price)
-                    })
-                
-                monthly_points = sorted(monthly_points, key=lambda x: x.get("date", ""))
-                detailed_data["historical_data"]["1mo"]["data"] = monthly_points
-        except Exception as e:
-            print(f"Error fetching monthly data for {symbol}: {str(e)}")
+        if not detailed_data["financial_metrics"]["profit_margin"] or detailed_data["financial_metrics"]["profit_margin"] == 0:
+            detailed_data["financial_metrics"]["profit_margin"] = ratios.get("netProfitMargin", 0) or 0
         
-        try:
-            yearly_url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}?from={(datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')}&to={datetime.now().strftime('%Y-%m-%d')}&apikey={api_key}"
-            yearly_response = requests.get(yearly_url)
-            yearly_data = yearly_response.json()
-            
-            if "historical" in yearly_data and isinstance(yearly_data["historical"], list):
-                weekly_points = []
-                by_week = {}
-                
-                for item in yearly_data["historical"]:
-                    date_str = item.get("date", "")
-                    try:
-                        dt = datetime.strptime(date_str, "%Y-%m-%d")
-                        year_week = f"{dt.year}-{dt.isocalendar()[1]}"
-                        
-                        if year_week not in by_week or dt > datetime.strptime(by_week[year_week].get("date"), "%Y-%m-%d"):
-                            by_week[year_week] = item
-                    except Exception as e:
-                        print(f"Error processing date {date_str} for weekly data: {str(e)}")
-                
-                for item in by_week.values():
-                    date_str = item.get("date", "")
-                    close_price = item.get("close", 0)
+    detailed_data["financial_metrics"]["recommendation"] = futures["rating"].result().get(symbol, "NONE")
                     
-                    weekly_points.append({
-                        "date": date_str,
-                        "close": float(close_price)
-                    })
-                
-                weekly_points = sorted(weekly_points, key=lambda x: x.get("date", ""))
-                detailed_data["historical_data"]["1y"]["data"] = weekly_points
-        except Exception as e:
-            print(f"Error fetching yearly data for {symbol}: {str(e)}")
+    price_target_data = futures["price_target"].result()
+    
+    if price_target_data and isinstance(price_target_data, list) and len(price_target_data) > 0:
+        detailed_data["financial_metrics"]["target_price"] = price_target_data[0].get("priceTarget", 0)
+    
+    try:
+        intraday_data = futures["intraday"].result()
         
-        try:
-            five_year_url = f"https://financialmodelingprep.com/api/v3/historical-price-full/{symbol}?from={(datetime.now() - timedelta(days=365*5)).strftime('%Y-%m-%d')}&to={datetime.now().strftime('%Y-%m-%d')}&apikey={api_key}"
-            five_year_response = requests.get(five_year_url)
-            five_year_data = five_year_response.json()
+        if isinstance(intraday_data, list):
+            intraday_data = sorted(intraday_data, key=lambda x: x.get("date", ""))
             
-            if "historical" in five_year_data and isinstance(five_year_data["historical"], list):
-                monthly_points = []
-                by_month = {}
-                
-                for item in five_year_data["historical"]:
-                    date_str = item.get("date", "")
-                    try:
-                        dt = datetime.strptime(date_str, "%Y-%m-%d")
-                        year_month = f"{dt.year}-{dt.month}"
-                        
-                        if year_month not in by_month or dt > datetime.strptime(by_month[year_month].get("date"), "%Y-%m-%d"):
-                            by_month[year_month] = item
-                    except Exception as e:
-                        print(f"Error processing date {date_str} for monthly data: {str(e)}")
+            recent_day_data = intraday_data[-78:] if len(intraday_data) > 78 else intraday_data
+            
+            daily_points = []
+            for item in recent_day_data:
+                date_str = item.get("date", "")
+                close_price = item.get("close", 0)
                 
-                for item in by_month.values():
-                    date_str = item.get("date", "")
-                    close_price = item.get("close", 0)
-                    
-                    monthly_points.append({
-                        "date": date_str,
-                        "close": float(close_price)
-                    })
+                daily_points.append({
+                    "date": date_str,
+                    "close": float(close_price)
+                })
+            
+            detailed_data["historical_data"]["1d"]["data"] = daily_points
+            detailed_data["historical_data"]["1d"]["interval"] = "5min"
+    except Exception as e:
+        print(f"Error fetching intraday data for {symbol}: {str(e)}")
+    
+    try:
+        if daily_history is not None:
+            monthly_points = []
+            for item in daily_history[:30]:
+                date_str = item.get("date", "")
+                close_price = item.get("close", 0)
                 
-                monthly_points = sorted(monthly_points, key=lambda x: x.get("date", ""))
-                detailed_data["historical_data"]["5y"]["data"] = monthly_points
-        except Exception as e:
-            print(f"Error fetching 5-year data for {symbol}: {str(e)}")
-        
-        return jsonify(detailed_data)
+                monthly_points.append({
+                    "date": date_str,
+                    "close": float(close_price)
+                })
+            
+            monthly_points = sorted(monthly_points, key=lambda x: x.get("date", ""))
+            detailed_data["historical_data"]["1mo"]["data"] = monthly_points
+    except Exception as e:
+        print(f"Error fetching monthly data for {symbol}: {str(e)}")
     
+    try:
+        if daily_history is not None:
+            one_year_ago = (today - timedelta(days=365)).strftime('%Y-%m-%d')
+            weekly_points = last_close_by_period(daily_history, "week", since=one_year_ago)
+            detailed_data["historical_data"]["1y"]["data"] = weekly_points
     except Exception as e:
-        error_response = {
-            "success": True,
-            "symbol": symbol,
-            "error_info": str(e),
-            "company_info": {"name": symbol, "sector": "", "industry": "", "exchange": "", "market_cap": 0, "employees": 0},
-            "price_data": {
-                "current_price": 0, "previous_close": 0, "open": 0,
-                "day_high": 0, "day_low": 0, "day_change": 0, "day_change_percent": 0,
-                "52wk_high": 0, "52wk_low": 0, "volume": 0
-            },
-            "financial_metrics": {
-                "pe_ratio": 0, "eps": 0, "dividend_yield": 0, 
-                "dividend_rate": 0, "profit_margin": 0, "beta": 0,
-                "recommendation": "NONE", "target_price": 0
-            },
-            "historical_data": {
-                "1d": {"interval": "15m", "data": []},
-                "1mo": {"interval": "1d", "data": []},
-                "1y": {"interval": "1wk", "data": []},
-                "5y": {"interval": "1mo", "data": []}
-            }
-        }
-        return jsonify(error_response)
\ No newline at end of file
+        print(f"Error fetching yearly data for {symbol}: {str(e)}")
+    
+    try:
+        if daily_history is not None:
+            monthly_points = last_close_by_period(daily_history, "month")
+            detailed_data["historical_data"]["5y"]["data"] = monthly_points
+    except Exception as e:
+        print(f"Error fetching 5-year data for {symbol}: {str(e)}")
+    
+    return detailed_data
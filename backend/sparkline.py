@@ -0,0 +1,46 @@
+import os
+
+POINTS = int(os.environ.get("SPARKLINE_POINTS", 32))
+
+
+def lttb_indices(values, budget=POINTS):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps to draw values with at most budget points.
+
+    Points are treated as evenly spaced. The first and last points are always kept; from each bucket
+    in between, LTTB keeps the point that forms the largest triangle with the previously kept point
+    and the average of the next bucket, which preserves peaks and dips that plain striding drops.
+    """
+    import numpy as np
+
+    n = len(values)
+    budget = max(budget, 3)
+    if n <= budget:
+        return np.arange(n)
+
+    y = np.asarray(values, dtype=np.float64)
+    edges = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    kept = np.empty(budget, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+
+    previous = 0
+    for b in range(budget - 2):
+        start, end = edges[b], edges[b + 1]
+        next_end = edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = (end + next_end - 1) / 2
+        avg_y = y[end:next_end].mean()
+
+        xs = np.arange(start, end)
+        areas = np.abs((previous - avg_x) * (y[start:end] - y[previous]) - (previous - xs) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        kept[b + 1] = previous
+    return kept
+
+def downsample(values, budget=POINTS):
+    """values reduced to at most budget points for a sparkline."""
+    return [values[i] for i in lttb_indices(values, budget)]
+
+def downsample_series(timestamps, values, budget=POINTS):
+    """Like downsample, keeping the timestamps of the retained points alongside them."""
+    indices = lttb_indices(values, budget)
+    return [timestamps[i] for i in indices], [values[i] for i in indices]
@@ -0,0 +1,164 @@
+import json
+import os
+import queue
+import threading
+import time
+import entities
+from caching import cache, shared_lock
+from ratelimit import priority, BACKGROUND
+
+POLL_INTERVAL = float(os.environ.get("STREAM_POLL_INTERVAL", 5))
+HEARTBEAT_INTERVAL = float(os.environ.get("STREAM_HEARTBEAT_INTERVAL", 15))
+MAX_SYMBOLS = int(os.environ.get("STREAM_MAX_SYMBOLS", 50))
+# Updates a slow client has not read yet; beyond this its oldest update is dropped.
+SUBSCRIBER_BUFFER = int(os.environ.get("STREAM_SUBSCRIBER_BUFFER", 100))
+
+
+def _tick(quote):
+    return {
+        "symbol": quote.get("symbol", "").upper(),
+        "price": quote.get("price", 0),
+        "change": quote.get("changesPercentage", 0)
+    }
+
+
+class Subscription:
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.updates = queue.Queue(maxsize=SUBSCRIBER_BUFFER)
+
+    def push(self, tick):
+        while True:
+            try:
+                self.updates.put_nowait(tick)
+                return
+            except queue.Full:
+                try:
+                    self.updates.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+class QuotePoller:
+    """One poller per process for every streamed symbol, fanning each changed quote out to its subscribers.
+
+    Each poll fetches the distinct subscribed symbols in batched quote calls. When several workers
+    stream, a shared per-symbol marker lets one of them refresh each symbol per interval while the
+    others read it from the cache, so upstream cost follows the number of distinct symbols rather
+    than clients or workers.
+    """
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._last_ticks = {}
+        self._thread = None
+
+    def subscribe(self, symbols):
+        subscription = Subscription(symbols)
+        with self._lock:
+            for symbol in symbols:
+                self._subscribers.setdefault(symbol, set()).add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+                self._thread.start()
+
+        # Start the client off with the latest known quotes instead of waiting for the next change.
+        for symbol, quote in entities.get_quotes(symbols).items():
+            tick = _tick(quote)
+            with self._lock:
+                tick = self._last_ticks.setdefault(symbol, tick)
+            subscription.push(tick)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for symbol in subscription.symbols:
+                subscribers = self._subscribers.get(symbol)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[symbol]
+                    self._last_ticks.pop(symbol, None)
+
+    def stats(self):
+        with self._lock:
+            clients = set().union(*self._subscribers.values()) if self._subscribers else set()
+            return {"symbols": len(self._subscribers), "subscribers": len(clients)}
+
+    def _claim(self, symbols, now):
+        """Returns the symbols no worker has polled this interval, marking them as polled by this one."""
+        due = []
+        with shared_lock("stream_poll", timeout=self.interval / 2) as acquired:
+            if not acquired:
+                return due
+            for symbol in symbols:
+                # Read the shared copy: another worker may have polled the symbol since we last looked.
+                marker = f"stream_poll:last_run:{symbol}"
+                cache.local.delete(marker)
+                if now - (cache.get(marker) or 0) >= self.interval:
+                    cache.set(marker, now, timeout=int(self.interval) + 1)
+                    due.append(symbol)
+        return due
+
+    def _fetch(self, symbols):
+        with priority(BACKGROUND):
+            due = self._claim(symbols, time.time())
+            quotes = entities.get_quotes(due, refresh=True) if due else {}
+
+            # Another worker refreshed these this interval; skip our local copies to read what it stored.
+            others = [symbol for symbol in symbols if symbol not in due]
+            for symbol in others:
+                cache.local.delete(f"entity:quote:{symbol}")
+            quotes.update(entities.get_quotes(others))
+            return quotes
+
+    def _poll_once(self):
+        with self._lock:
+            symbols = list(self._subscribers)
+        if not symbols:
+            return False
+
+        for symbol, quote in self._fetch(symbols).items():
+            tick = _tick(quote)
+            with self._lock:
+                if self._last_ticks.get(symbol) == tick:
+                    continue
+                self._last_ticks[symbol] = tick
+                subscribers = list(self._subscribers.get(symbol, ()))
+            for subscription in subscribers:
+                subscription.push(tick)
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                active = self._poll_once()
+            except Exception as e:
+                print(f"Error polling streamed quotes: {str(e)}")
+                active = True
+
+            with self._lock:
+                if not active and not self._subscribers:
+                    self._thread = None
+                    return
+            time.sleep(self.interval)
+
+
+poller = QuotePoller()
+
+def event_stream(symbols):
+    """Yields Server-Sent Events with a "quote" event per price change and periodic keep-alive comments."""
+    subscription = poller.subscribe(symbols)
+    try:
+        while True:
+            try:
+                tick = subscription.updates.get(timeout=HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: quote\ndata: {json.dumps(tick)}\n\n"
+    finally:
+        poller.unsubscribe(subscription)
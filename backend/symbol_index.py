@@ -0,0 +1,174 @@
+import bisect
+import heapq
+import os
+import re
+import threading
+import time
+import fmp
+from ratelimit import priority, BACKGROUND
+
+REFRESH_INTERVAL = int(os.environ.get("SYMBOL_INDEX_REFRESH_INTERVAL", 86400))
+# Seconds to wait before trying again after a failed load.
+RETRY_INTERVAL = int(os.environ.get("SYMBOL_INDEX_RETRY_INTERVAL", 60))
+# Listings on these exchanges rank ahead of equally good matches elsewhere.
+PREFERRED_EXCHANGES = ("NASDAQ", "NYSE", "AMEX")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def _postings(pairs):
+    """Turns (key, id) pairs into a sorted key list and a parallel list of ascending id lists."""
+    postings = {}
+    for key, i in pairs:
+        postings.setdefault(key, []).append(i)
+    keys = sorted(postings)
+    return keys, [postings[key] for key in keys]
+
+
+class SymbolIndex:
+    """Ticker and company-name lookup over FMP's full stock list, built once and queried in-process.
+
+    Listings are numbered best-first (preferred exchange, shorter ticker), and every posting list
+    is in id order, so each match tier is read lazily and stops as soon as it has enough hits.
+    Tickers and name words are looked up by prefix with bisection; a trigram index over
+    "ticker name" finds queries that match inside a word.
+    """
+
+    def __init__(self, listings):
+        self.listings = []
+        for item in listings:
+            symbol = (item.get("symbol") or "").upper()
+            if symbol:
+                self.listings.append({
+                    "symbol": symbol,
+                    "name": item.get("name") or symbol,
+                    "exchangeShortName": item.get("exchangeShortName") or "",
+                    "stockExchange": item.get("exchange") or ""
+                })
+        self.listings.sort(key=lambda listing: (
+            listing["exchangeShortName"] not in PREFERRED_EXCHANGES, len(listing["symbol"]), listing["symbol"]
+        ))
+
+        self._name_words = [_words(listing["name"]) for listing in self.listings]
+        self._texts = [" ".join(_words(f"{listing['symbol']} {listing['name']}")) for listing in self.listings]
+
+        self._symbols = sorted((listing["symbol"], i) for i, listing in enumerate(self.listings))
+        self._words, self._word_ids = _postings(
+            (word, i) for i, words in enumerate(self._name_words) for word in dict.fromkeys(words)
+        )
+        self._starts, self._start_ids = _postings(
+            (words[0], i) for i, words in enumerate(self._name_words) if words
+        )
+        self._trigrams = {}
+        for i, text in enumerate(self._texts):
+            for gram in {text[j:j + 3] for j in range(len(text) - 2)}:
+                self._trigrams.setdefault(gram, []).append(i)
+
+    def __len__(self):
+        return len(self.listings)
+
+    def _symbol_matches(self, ticker):
+        for pos in range(bisect.bisect_left(self._symbols, (ticker,)), len(self._symbols)):
+            symbol, i = self._symbols[pos]
+            if not symbol.startswith(ticker):
+                break
+            yield symbol == ticker, i
+
+    @staticmethod
+    def _prefix_postings(keys, ids, prefix):
+        """The id lists of every key starting with prefix."""
+        lo = bisect.bisect_left(keys, prefix)
+        hi = lo
+        while hi < len(keys) and keys[hi].startswith(prefix):
+            hi += 1
+        return ids[lo:hi]
+
+    def _has_words(self, i, words):
+        return all(any(name_word.startswith(word) for name_word in self._name_words[i]) for word in words)
+
+    def _tiers(self, query, words, limit):
+        """Yields an ascending id stream per match tier, best tier first."""
+        ticker = query.strip().upper()
+        symbol_matches = list(self._symbol_matches(ticker))
+        yield sorted(i for exact, i in symbol_matches if exact)
+        yield heapq.nsmallest(limit, (i for exact, i in symbol_matches if not exact))
+
+        # The name starts with the first word and every other query word starts some word of the name.
+        starts = heapq.merge(*self._prefix_postings(self._starts, self._start_ids, words[0]))
+        yield (i for i in starts if self._has_words(i, words[1:]))
+
+        # Any word order, driven by the query word with the fewest postings.
+        postings = [self._prefix_postings(self._words, self._word_ids, word) for word in words]
+        rarest = min(range(len(words)), key=lambda k: sum(map(len, postings[k])))
+        others = words[:rarest] + words[rarest + 1:]
+        yield (i for i in heapq.merge(*postings[rarest]) if self._has_words(i, others))
+
+        text = " ".join(words)
+        grams = [self._trigrams.get(text[j:j + 3], ()) for j in range(len(text) - 2)]
+        if grams:
+            yield (i for i in min(grams, key=len) if text in self._texts[i])
+
+    def search(self, query, limit=10):
+        """Returns up to limit listings ranked by exact ticker, ticker prefix, name prefix, name words, then substring."""
+        words = _words(query)
+        if not words:
+            return []
+
+        found = []
+        seen = set()
+        for ids in self._tiers(query, words, limit):
+            for i in ids:
+                if len(found) >= limit:
+                    break
+                if i not in seen:
+                    seen.add(i)
+                    found.append(i)
+            if len(found) >= limit:
+                break
+        return [self.listings[i] for i in found]
+
+
+_index = None
+_loaded_at = 0
+_retry_at = 0
+_loading = threading.Lock()
+
+def _load():
+    global _index, _loaded_at
+    try:
+        with priority(BACKGROUND):
+            listings = fmp.get_json("v3/stock/list", "symbol_list")
+        if isinstance(listings, list) and listings:
+            _index = SymbolIndex(listings)
+            _loaded_at = time.time()
+        else:
+            print(f"Error loading symbol list: {str(listings)[:200]}")
+    except Exception as e:
+        print(f"Error loading symbol list: {str(e)}")
+    finally:
+        _loading.release()
+
+def get_index():
+    """Returns the loaded index, or None while the first load is still running.
+
+    Loading and the daily refresh happen on a background thread; searches keep using the previous
+    index until the new one is ready.
+    """
+    global _retry_at
+    now = time.time()
+    due = _index is None or now - _loaded_at >= REFRESH_INTERVAL
+    if due and now >= _retry_at and _loading.acquire(blocking=False):
+        _retry_at = now + RETRY_INTERVAL
+        threading.Thread(target=_load, name="symbol-index", daemon=True).start()
+    return _index
+
+def search(query, limit=10):
+    """Ranked listings for query, or None if the index is not available yet."""
+    index = get_index()
+    if index is None:
+        return None
+    return index.search(query, limit)
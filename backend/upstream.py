@@ -0,0 +1,117 @@
+import os
+import threading
+import contextvars
+import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from singleflight import SingleFlight
+from ratelimit import current_priority, queued, INTERACTIVE, BACKGROUND
+
+CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", 10))
+MAX_RETRIES = int(os.environ.get("UPSTREAM_MAX_RETRIES", 2))
+BACKOFF_FACTOR = float(os.environ.get("UPSTREAM_BACKOFF_FACTOR", 0.3))
+POOL_HOSTS = int(os.environ.get("UPSTREAM_POOL_HOSTS", 10))
+POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", 20))
+MAX_IN_FLIGHT = int(os.environ.get("UPSTREAM_MAX_IN_FLIGHT", 20))
+MAX_WORKERS = int(os.environ.get("FMP_MAX_WORKERS", 10))
+BACKGROUND_WORKERS = int(os.environ.get("FMP_BACKGROUND_WORKERS", 4))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _build_session():
+    """Create the shared session: one keep-alive pool per host, retries for idempotent calls only."""
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+    http = requests.Session()
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
+
+session = _build_session()
+_in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+
+class _ContextExecutor(ThreadPoolExecutor):
+    """Runs each task in a copy of the submitter's context, so its call priority follows the work."""
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, queued(fn), *args, **kwargs)
+
+# Pools for fanning independent upstream calls out concurrently, one per priority: background
+# work waiting for rate-limit tokens holds its own workers, never the ones requests queue for.
+executors = {
+    INTERACTIVE: _ContextExecutor(max_workers=MAX_WORKERS, thread_name_prefix="upstream"),
+    BACKGROUND: _ContextExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="upstream-background")
+}
+
+_executor_override = contextvars.ContextVar("upstream_executor", default=None)
+
+def create_executor(max_workers, thread_name_prefix):
+    """A dedicated pool for work that must not share the standard ones, for use with using_executor."""
+    return _ContextExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+@contextmanager
+def using_executor(executor):
+    """Sends every fan-out made inside the block (and by the tasks it starts) to executor."""
+    token = _executor_override.set(executor)
+    try:
+        yield
+    finally:
+        _executor_override.reset(token)
+
+def submit(fn, *args, **kwargs):
+    """Starts fn on the pool chosen with using_executor, or else the pool for the caller's priority."""
+    executor = _executor_override.get() or executors[current_priority()]
+    return executor.submit(fn, *args, **kwargs)
+
+# Identical GETs issued while one is already in flight wait for it instead of going out again.
+_single_flight = SingleFlight()
+
+def submit_all(fn, args_list):
+    """Starts fn(*args) on the pool for the caller's priority for every args tuple and returns the futures.
+
+    A lone call runs inline instead, so single-symbol lookups made from a pool thread
+    never block that thread on work queued behind it.
+    """
+    if len(args_list) != 1:
+        return [submit(fn, *args) for args in args_list]
+
+    future = Future()
+    try:
+        future.set_result(fn(*args_list[0]))
+    except Exception as e:
+        future.set_exception(e)
+    return [future]
+
+def request(method, url, **kwargs):
+    """Send a request through the shared pool, waiting for a free in-flight slot first."""
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    with _in_flight:
+        return session.request(method, url, **kwargs)
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+def get_json(url, params=None, limiter=None, **kwargs):
+    """GET and decode url. With a limiter, only the call that actually goes out spends a token."""
+    def fetch():
+        if limiter is not None:
+            limiter.acquire()
+        return get(url, params=params, **kwargs).json()
+
+    key = (url, tuple(sorted((params or {}).items())))
+    return _single_flight.do(key, fetch)
@@ -0,0 +1,47 @@
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from db import db
+from models import WatchlistChange
+
+ADD = "add"
+REMOVE = "remove"
+# Seconds a change is kept; clients whose version is older than this have to fetch the full list again.
+RETENTION = int(os.environ.get("WATCHLIST_CHANGE_RETENTION", 30 * 86400))
+
+
+def record_changes(google_id, symbols, action):
+    """Logs symbols added to or removed from a watchlist, as part of the caller's transaction.
+
+    The user's changes older than RETENTION are deleted at the same time.
+    """
+    now = datetime.utcnow()
+    (
+        WatchlistChange.query
+        .filter(WatchlistChange.google_id == google_id, WatchlistChange.changed_at < now - timedelta(seconds=RETENTION))
+        .delete(synchronize_session=False)
+    )
+    db.session.add_all(
+        WatchlistChange(google_id=google_id, symbol=symbol, action=action, changed_at=now)
+        for symbol in symbols
+    )
+
+def current_version(google_id):
+    """The id of the user's latest watchlist change, or 0 if the watchlist never changed."""
+    return db.session.query(func.max(WatchlistChange.id)).filter(WatchlistChange.google_id == google_id).scalar() or 0
+
+def is_expired(version_ms):
+    """Whether changes made after version_ms (a millisecond timestamp) may already have been deleted."""
+    return version_ms < (time.time() - RETENTION) * 1000
+
+def changes_since(google_id, version):
+    """Returns ({symbol: ADD or REMOVE}, latest version): the net effect of every change after version."""
+    changes = (
+        WatchlistChange.query
+        .filter(WatchlistChange.google_id == google_id, WatchlistChange.id > version)
+        .order_by(WatchlistChange.id)
+        .all()
+    )
+    latest = changes[-1].id if changes else version
+    return {change.symbol: change.action for change in changes}, latest